@@ -2,35 +2,15 @@ from time import sleep
 
 from wheezy.http import (
     HTTPResponse,
+    HTTPStreamingResponse,
     WSGIApplication,
     bootstrap_http_defaults,
     not_found,
 )
+from wheezy.http.transforms import gzip_stream_transform, response_transforms
 
 
-class HTTPTextStreamingResponse(object):
-    status_code = 200
-    cache_profile = None
-
-    def __init__(
-        self,
-        iterable,
-        content_type="text/html; charset=UTF-8",
-        encoding="UTF-8",
-    ):
-        self.iterable = iterable
-        self.encoding = encoding
-        self.headers = [
-            ("Content-Type", content_type),
-            ("Cache-Control", "private"),
-        ]
-
-    def __call__(self, start_response):
-        """WSGI call processing."""
-        start_response("200 OK", self.headers)
-        return (chunk.encode(self.encoding) for chunk in self.iterable)
-
-
+@response_transforms(gzip_stream_transform())
 def hello(request):
     def generate():
         yield "START"
@@ -38,7 +18,7 @@ def hello(request):
             yield "Hello World!"
             sleep(2)
 
-    return HTTPTextStreamingResponse(generate())
+    return HTTPStreamingResponse(generate())
 
 
 def welcome(request):
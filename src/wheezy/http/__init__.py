@@ -12,7 +12,11 @@ from wheezy.http.cookie import HTTPCookie
 from wheezy.http.method import accept_method
 from wheezy.http.request import HTTPRequest
 from wheezy.http.response import (
+    HTTPArenaResponse,
+    HTTPErrorResponse,
+    HTTPFileResponse,
     HTTPResponse,
+    HTTPStreamingResponse,
     ajax_redirect,
     bad_request,
     error400,
@@ -46,7 +50,11 @@ __all__ = (
     "HTTPCookie",
     "accept_method",
     "HTTPRequest",
+    "HTTPArenaResponse",
+    "HTTPErrorResponse",
+    "HTTPFileResponse",
     "HTTPResponse",
+    "HTTPStreamingResponse",
     "ajax_redirect",
     "bad_request",
     "error400",
@@ -1,7 +1,7 @@
 from functools import reduce
 
 from wheezy.http.request import HTTPRequest
-from wheezy.http.response import not_found
+from wheezy.http.response import HTTP_ERROR_RESPONSES
 
 
 def wrap_middleware(following, func):
@@ -63,5 +63,5 @@ class WSGIApplication(object):
         request = HTTPRequest(environ, self.encoding, self.options)
         response = self.middleware(request)
         if response is None:
-            response = not_found()
+            response = HTTP_ERROR_RESPONSES[404]
         return response(start_response)
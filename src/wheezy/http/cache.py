@@ -1,7 +1,23 @@
-from hashlib import md5
-from zlib import crc32
+import re
+from datetime import timezone
+from functools import partial
+from hashlib import blake2b, md5
+from itertools import chain
+from uuid import uuid4
+from zlib import adler32, crc32
 
 from wheezy.http.cacheprofile import none_cache_profile
+from wheezy.http.httpdate import parse_http_datetime
+from wheezy.http.parse import parse_range
+from wheezy.http.response import (
+    HTTPErrorResponse,
+    HTTPFileResponse,
+    HTTPStreamingResponse,
+    http_error,
+)
+
+UTC = timezone.utc
+RE_ETAGS = re.compile(r'(?:W/)?("[^"]*"|[^\s,]+)')
 
 
 def response_cache(profile=None):
@@ -21,11 +37,13 @@ def response_cache(profile=None):
                 etag_func = profile.etag_func
 
                 def etag(request, *args, **kwargs):
-                    response = handler(request, *args, **kwargs)
+                    response = mutable_response(
+                        handler(request, *args, **kwargs)
+                    )
                     response.cache_profile = profile
                     response.cache_policy = cache_policy_func()
-                    response.cache_policy.http_etag = etag_func(
-                        response.buffer
+                    response.cache_policy.http_etag = response_etag(
+                        etag_func, response
                     )
                     return response
 
@@ -33,7 +51,9 @@ def response_cache(profile=None):
             else:
 
                 def cache(request, *args, **kwargs):
-                    response = handler(request, *args, **kwargs)
+                    response = mutable_response(
+                        handler(request, *args, **kwargs)
+                    )
                     response.cache_profile = profile
                     response.cache_policy = cache_policy_func()
                     return response
@@ -42,7 +62,7 @@ def response_cache(profile=None):
         else:
 
             def no_cache(request, *args, **kwargs):
-                response = handler(request, *args, **kwargs)
+                response = mutable_response(handler(request, *args, **kwargs))
                 response.cache_profile = None
                 response.cache_policy = cache_policy_func()
                 return response
@@ -52,6 +72,28 @@ def response_cache(profile=None):
     return decorate
 
 
+def mutable_response(response):
+    """Returns a response that can be modified, a shared immutable
+    ``HTTPErrorResponse`` is replaced by its mutable equivalent.
+    """
+    if isinstance(response, HTTPErrorResponse):
+        return http_error(response.status_code)
+    return response
+
+
+def response_etag(etag_func, response):
+    """Returns ETag of ``response`` built by ``etag_func`` from its
+    buffer. The buffer of file response is always empty, so the ETag
+    is built from file metadata instead. Returns ``None`` for streaming
+    response, its buffer can be iterated only once.
+    """
+    if isinstance(response, HTTPFileResponse):
+        return etag_stat(response.stat)
+    if isinstance(response, HTTPStreamingResponse):
+        return None
+    return etag_func(response.buffer)
+
+
 def wsgi_cache(profile):
     """Decorator that wraps wsgi app and set cache profile."""
 
@@ -96,6 +138,81 @@ def make_etag_crc32(hasher):
 
 
 etag_md5crc32 = make_etag_crc32(md5)
+etag_blake2b = make_etag(partial(blake2b, digest_size=8))
+
+
+def make_etag_checksum(checksum):
+    """Build etag function based on running `checksum` algorithm,
+    e.g. ``zlib.crc32`` or ``zlib.adler32``.
+    """
+    initial = checksum(b"")
+
+    def etag(buf):
+        value = initial
+        for chunk in buf:
+            value = checksum(chunk, value)
+        return '"%08x"' % (value & 0xFFFFFFFF)
+
+    return etag
+
+
+etag_crc32 = make_etag_checksum(crc32)
+etag_adler32 = make_etag_checksum(adler32)
+
+
+def etag_stat(st):
+    """Build weak etag from file metadata, ``st`` is the result of
+    ``os.stat`` call. The content is not read at all.
+
+    >>> from os import stat_result
+    >>> etag_stat(stat_result((0, 0, 0, 0, 0, 0, 1024, 0, 1500000000, 0)))
+    'W/"59682f00-400"'
+    """
+    return 'W/"%x-%x"' % (int(st.st_mtime), st.st_size)
+
+
+def etag_match(etag, if_none_match):
+    """Checks whenever ``etag`` matches any entity tag in
+    If-None-Match HTTP request header value. Uses weak comparison,
+    so ``W/`` prefix is ignored.
+
+    >>> etag_match('"a"', '"x", W/"a"')
+    True
+    >>> etag_match('W/"a"', '"a"')
+    True
+    >>> etag_match('"a"', '"a,b"')
+    False
+    >>> etag_match('"a"', '*')
+    True
+    """
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    for tag in RE_ETAGS.findall(if_none_match):
+        if tag == etag or tag == "*":
+            return True
+    return False
+
+
+def modified_since(if_modified_since, last_modified):
+    """Checks whenever ``last_modified`` is later than
+    If-Modified-Since HTTP request header value. HTTP dates have
+    one second resolution, so microseconds are ignored.
+
+    >>> from datetime import datetime
+    >>> when = datetime(2012, 4, 17, 9, 58, 27, 500, tzinfo=UTC)
+    >>> modified_since('Tue, 17 Apr 2012 09:58:27 GMT', when)
+    False
+    >>> modified_since('Tue, 17 Apr 2012 09:58:26 GMT', when)
+    True
+    >>> modified_since('x', when)
+    True
+    """
+    since = parse_http_datetime(if_modified_since)
+    if since is None:
+        return True
+    if last_modified.tzinfo is not None:
+        since = since.replace(tzinfo=UTC)
+    return since < last_modified.replace(microsecond=0)
 
 
 class SurfaceResponse(object):
@@ -154,3 +271,146 @@ class CacheableResponse(object):
         """WSGI call processing."""
         start_response("200 OK", self.headers)
         return self.buffer
+
+
+def range_response(environ, headers, length, read):
+    """Returns partial content response for Range HTTP request
+    header or ``None`` if the full response should be sent.
+
+    ``headers`` - the full response headers.
+    ``length`` - the full response body length.
+    ``read`` - a callable ``read(start, end)`` that returns an
+    iterable of body chunks in range.
+    """
+    if "HTTP_RANGE" not in environ:
+        return None
+    if "HTTP_IF_RANGE" in environ and not if_range_match(
+        environ["HTTP_IF_RANGE"], headers
+    ):
+        return None
+    ranges = parse_range(environ["HTTP_RANGE"], length)
+    if ranges is None:
+        return None
+    if not ranges:
+        return RangeNotSatisfiableResponse(headers, length)
+    return PartialContentResponse(headers, ranges, length, read)
+
+
+def if_range_match(if_range, headers):
+    """Checks If-Range HTTP request header against response
+    ETag (strong comparison) or Last-Modified (exact match).
+    """
+    if if_range.startswith("W/"):
+        return False
+    name = if_range.startswith('"') and "ETag" or "Last-Modified"
+    for n, v in headers:
+        if n == name:
+            return v == if_range
+    return False
+
+
+def slice_chunks(chunks, start, end):
+    """Returns a list of ``chunks`` in range from ``start`` to ``end``
+    (exclusive). Chunks that are in range entirely are not copied,
+    only the edge ones are sliced.
+
+    >>> slice_chunks([b'abc', b'de', b'fgh'], 2, 7)
+    [b'c', b'de', b'fg']
+    """
+    result = []
+    offset = 0
+    for chunk in chunks:
+        n = len(chunk)
+        if offset + n > start:
+            i = max(start - offset, 0)
+            j = end - offset
+            if i == 0 and j >= n:
+                result.append(chunk)
+            else:
+                result.append(chunk[i:j])
+        offset += n
+        if offset >= end:
+            break
+    return result
+
+
+class PartialContentResponse(object):
+    """Partial content response, a single range or multipart/byteranges
+    for several ranges.
+    """
+
+    status_code = 206
+    cache_policy = None
+    cache_profile = None
+
+    def __init__(self, headers, ranges, length, read):
+        """Initializes partial content response."""
+        headers = [h for h in headers if h[0] != "Content-Length"]
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            headers.append(
+                ("Content-Range", "bytes %d-%d/%d" % (start, end - 1, length))
+            )
+            buffer = read(start, end)
+            content_length = end - start
+        else:
+            content_type = "application/octet-stream"
+            for i, (name, value) in enumerate(headers):
+                if name == "Content-Type":
+                    content_type = value
+                    del headers[i]
+                    break
+            boundary = uuid4().hex
+            headers.append(
+                (
+                    "Content-Type",
+                    "multipart/byteranges; boundary=" + boundary,
+                )
+            )
+            parts = []
+            content_length = 0
+            for start, end in ranges:
+                part = (
+                    "--%s\r\nContent-Type: %s\r\n"
+                    "Content-Range: bytes %d-%d/%d\r\n\r\n"
+                    % (boundary, content_type, start, end - 1, length)
+                ).encode("latin1")
+                parts.append((part,))
+                parts.append(read(start, end))
+                parts.append((b"\r\n",))
+                content_length += len(part) + end - start + 2
+            part = ("--%s--\r\n" % boundary).encode("latin1")
+            parts.append((part,))
+            content_length += len(part)
+            buffer = chain.from_iterable(parts)
+        headers.append(("Content-Length", str(content_length)))
+        self.headers = headers
+        self.buffer = buffer
+
+    def __call__(self, start_response):
+        """WSGI call processing."""
+        start_response("206 Partial Content", self.headers)
+        return self.buffer
+
+
+class RangeNotSatisfiableResponse(object):
+    """Range not satisfiable response."""
+
+    status_code = 416
+    cache_policy = None
+    cache_profile = None
+
+    def __init__(self, headers, length):
+        """Initializes range not satisfiable response."""
+        self.headers = [
+            h
+            for h in headers
+            if h[0] not in ("Content-Length", "Content-Encoding")
+        ]
+        self.headers.append(("Content-Range", "bytes */%d" % length))
+        self.headers.append(("Content-Length", "0"))
+
+    def __call__(self, start_response):
+        """WSGI call processing."""
+        start_response("416 Requested Range Not Satisfiable", self.headers)
+        return []
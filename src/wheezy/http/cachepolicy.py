@@ -1,4 +1,6 @@
-from wheezy.core.datetime import format_http_datetime, total_seconds
+from wheezy.core.datetime import total_seconds
+
+from wheezy.http.httpdate import format_http_datetime
 
 SUPPORTED = ["no-cache", "private", "public"]
 
@@ -15,6 +17,8 @@ class HTTPCachePolicy(object):
     is_no_transform = False
     max_age_delta = -1
     smax_age_delta = -1
+    # Cache-Control, Pragma and Vary headers shared between copies
+    rendered = None
 
     def __init__(self, cacheability="private"):
         """Initialize cache policy with a given cacheability."""
@@ -32,17 +36,64 @@ class HTTPCachePolicy(object):
     def extend(self, headers):
         """Updates ``headers`` with this cache policy."""
         append = headers.append
-        append(self.http_cache_control())
-        if self.http_pragma:
-            append(("Pragma", self.http_pragma))
+        rendered = self.rendered
+        if rendered is None:
+            append(self.http_cache_control())
+            if self.http_pragma:
+                append(("Pragma", self.http_pragma))
+        else:
+            headers.extend(rendered[0])
         if self.http_expires:
             append(("Expires", self.http_expires))
         if self.http_last_modified:
             append(("Last-Modified", self.http_last_modified))
         if self.http_etag:
             append(("ETag", self.http_etag))
-        if self.vary_headers:
-            append(self.http_vary())
+        if rendered is None:
+            if self.vary_headers:
+                append(self.http_vary())
+        else:
+            headers.extend(rendered[1])
+
+    def copy(self):
+        """Returns a copy of this cache policy. Cache-Control, Pragma
+        and Vary headers are rendered once and shared with the copy
+        until either is changed with a method call, the time dependent
+        fields (Expires, Last-Modified) and ETag are not shared.
+        """
+        if self.rendered is None:
+            self.vary_headers = tuple(self.vary_headers)
+            self.private_fields = tuple(self.private_fields)
+            self.no_cache_fields = tuple(self.no_cache_fields)
+            self.extensions = tuple(self.extensions)
+            head = [self.http_cache_control()]
+            if self.http_pragma:
+                head.append(("Pragma", self.http_pragma))
+            self.rendered = (
+                tuple(head),
+                self.vary_headers and (self.http_vary(),) or (),
+            )
+        cls = self.__class__
+        policy = cls.__new__(cls)
+        policy.__dict__.update(self.__dict__)
+        return policy
+
+    def copy_on_write(self):
+        """Drops headers shared with a copy before this cache policy
+        is changed.
+        """
+        if self.rendered is not None:
+            self.rendered = None
+            self.vary_headers = list(self.vary_headers)
+            self.private_fields = list(self.private_fields)
+            self.no_cache_fields = list(self.no_cache_fields)
+            self.extensions = list(self.extensions)
+
+    def freeze(self):
+        """Returns an immutable copy of this cache policy with
+        headers rendered once.
+        """
+        return FrozenHTTPCachePolicy(self)
 
     def fail_no_cache(self, option):
         if self.is_no_cache:
@@ -67,6 +118,7 @@ class HTTPCachePolicy(object):
         """
         if fields:
             assert self.assert_public("private field(s)")
+            self.copy_on_write()
             self.private_fields += fields
 
     def no_cache(self, *fields):
@@ -78,6 +130,7 @@ class HTTPCachePolicy(object):
         """
         if fields:
             assert self.fail_no_cache("no-cache fields")
+            self.copy_on_write()
             self.no_cache_fields += fields
 
     def no_store(self):
@@ -85,6 +138,7 @@ class HTTPCachePolicy(object):
         prevent the inadvertent release or retention of
         sensitive information.
         """
+        self.copy_on_write()
         self.is_no_store = True
 
     def must_revalidate(self):
@@ -99,6 +153,7 @@ class HTTPCachePolicy(object):
         Raises AssertionError if proxy-revalidave is set.
         """
         assert not self.is_proxy_revalidate, "proxy-revalidate is already set"
+        self.copy_on_write()
         self.is_must_revalidate = True
 
     def proxy_revalidate(self):
@@ -110,6 +165,7 @@ class HTTPCachePolicy(object):
         Raises AssertionError if must-revalidave is set.
         """
         assert not self.is_must_revalidate, "must-revalidate is already set"
+        self.copy_on_write()
         self.is_proxy_revalidate = True
 
     def no_transform(self):
@@ -117,10 +173,12 @@ class HTTPCachePolicy(object):
         of the entity-body that is specified by this header,
         including the value of the entity-body itself.
         """
+        self.copy_on_write()
         self.is_no_transform = True
 
     def append_extension(self, extension):
         """Appends the ``extension`` to the Cache-Control HTTP header."""
+        self.copy_on_write()
         self.extensions.append(extension)
 
     def max_age(self, delta):
@@ -132,6 +190,7 @@ class HTTPCachePolicy(object):
         Not valid for ``no-cache`` cacheability, raise AssertionError.
         """
         assert self.fail_no_cache("max-age")
+        self.copy_on_write()
         self.max_age_delta = total_seconds(delta)
 
     def smax_age(self, delta):
@@ -147,6 +206,7 @@ class HTTPCachePolicy(object):
         Not valid for ``no-cache`` cacheability, raise AssertionError.
         """
         assert self.fail_no_cache("smax-age")
+        self.copy_on_write()
         self.smax_age_delta = total_seconds(delta)
 
     def expires(self, when):
@@ -187,6 +247,7 @@ class HTTPCachePolicy(object):
         Not valid for ``no-cache`` cacheability, raise AssertionError.
         """
         assert self.fail_no_cache("vary")
+        self.copy_on_write()
         if headers:
             self.vary_headers.extend(headers)
         else:
@@ -219,3 +280,83 @@ class HTTPCachePolicy(object):
         if self.smax_age_delta >= 0:
             append("smax-age=" + str(self.smax_age_delta))
         return ("Cache-Control", ", ".join(directives))
+
+
+class FrozenHTTPCachePolicy(object):
+    """Immutable cache policy, the headers are rendered once on
+    construction, so ``extend`` is a plain list extend. Suitable
+    for a policy that is shared between responses.
+    """
+
+    __slots__ = (
+        "cacheability",
+        "is_no_cache",
+        "is_public",
+        "is_no_store",
+        "is_must_revalidate",
+        "is_proxy_revalidate",
+        "is_no_transform",
+        "max_age_delta",
+        "smax_age_delta",
+        "modified",
+        "http_pragma",
+        "http_expires",
+        "http_last_modified",
+        "http_etag",
+        "vary_headers",
+        "private_fields",
+        "no_cache_fields",
+        "extensions",
+        "headers",
+    )
+
+    def __init__(self, policy):
+        """Initialize frozen cache policy from ``policy``."""
+        for name in (
+            "cacheability",
+            "is_no_cache",
+            "is_public",
+            "is_no_store",
+            "is_must_revalidate",
+            "is_proxy_revalidate",
+            "is_no_transform",
+            "max_age_delta",
+            "smax_age_delta",
+            "modified",
+            "http_pragma",
+            "http_expires",
+            "http_last_modified",
+            "http_etag",
+        ):
+            setattr(self, name, getattr(policy, name))
+        self.vary_headers = tuple(policy.vary_headers)
+        self.private_fields = tuple(policy.private_fields)
+        self.no_cache_fields = tuple(policy.no_cache_fields)
+        self.extensions = tuple(policy.extensions)
+        headers = []
+        policy.extend(headers)
+        self.headers = tuple(headers)
+
+    def extend(self, headers):
+        """Updates ``headers`` with this cache policy."""
+        headers.extend(self.headers)
+
+    def freeze(self):
+        """Returns this cache policy."""
+        return self
+
+    def http_cache_control(self):
+        """Returns a value for Cache-Control header."""
+        return self.headers[0]
+
+    def http_vary(self):
+        """Returns a value for Vary header."""
+        return ("Vary", ", ".join(self.vary_headers))
+
+    def fail_frozen(self, *args, **kwargs):
+        raise AssertionError("cache policy is frozen")
+
+    private = no_cache = no_store = must_revalidate = fail_frozen
+    proxy_revalidate = no_transform = append_extension = fail_frozen
+    max_age = smax_age = expires = last_modified = etag = fail_frozen
+    vary = fail_frozen
@@ -1,11 +1,10 @@
-from datetime import datetime, timezone
 from time import time
 
-from wheezy.core.datetime import format_http_datetime, total_seconds
+from wheezy.core.datetime import total_seconds
 
 from wheezy.http.cachepolicy import HTTPCachePolicy
+from wheezy.http.httpdate import format_http_timestamp, utc_fromtimestamp
 
-UTC = timezone.utc
 CACHEABILITY = {
     "none": "no-cache",
     "server": "no-cache",
@@ -15,7 +14,6 @@ CACHEABILITY = {
 }
 
 SUPPORTED = CACHEABILITY.keys()
-fromtimestamp = datetime.fromtimestamp
 
 
 class CacheProfile(object):
@@ -51,11 +49,21 @@ class CacheProfile(object):
                     cookies=vary_cookies,
                     environ=vary_environ,
                 )
+            if location != "none":
+                duration = total_seconds(duration)
+                if not duration > 0:
+                    raise ValueError("Invalid duration.")
+                self.duration = duration
+                if http_max_age is None:
+                    self.http_max_age = duration
+                else:
+                    self.http_max_age = total_seconds(http_max_age)
             cacheability = CACHEABILITY[location]
+            policy = HTTPCachePolicy(cacheability)
+            if no_store:
+                policy.no_store()
             if location in ("none", "server"):
-                policy = HTTPCachePolicy(cacheability)
-                if no_store:
-                    policy.no_store()
+                policy = policy.freeze()
                 self.etag_func = None
                 self.cache_policy = lambda: policy
             else:
@@ -64,15 +72,11 @@ class CacheProfile(object):
                 self.cache_policy = self.client_policy
                 self.cacheability = cacheability
                 self.no_store = no_store
-            if location != "none":
-                duration = total_seconds(duration)
-                if not duration > 0:
-                    raise ValueError("Invalid duration.")
-                self.duration = duration
-                if http_max_age is None:
-                    self.http_max_age = duration
-                else:
-                    self.http_max_age = total_seconds(http_max_age)
+                policy.max_age_delta = self.http_max_age
+                if http_vary is not None:
+                    policy.vary(*http_vary)
+                # headers that do not depend on time are rendered once
+                self.shared_policy = policy
         self.enabled = enabled
 
     def cache_policy(self):
@@ -84,25 +88,20 @@ class CacheProfile(object):
 
     def client_policy(self):
         """Returns ``private`` or ``public`` http cache policy
-        depending on cache profile selected.
+        depending on cache profile selected. The policy is a copy of
+        one shared by the profile, so only Last-Modified and Expires
+        are computed per call.
         """
-        policy = HTTPCachePolicy(self.cacheability)
-        if self.no_store:
-            policy.no_store()
+        policy = self.shared_policy.copy()
         now = int(time())
+        policy.modified = utc_fromtimestamp(now)
+        policy.http_last_modified = format_http_timestamp(now)
         if self.http_max_age:
-            policy.last_modified(fromtimestamp(now, UTC))
-            policy.expires(fromtimestamp(now + self.http_max_age, UTC))
-            policy.max_age_delta = self.http_max_age
+            policy.http_expires = format_http_timestamp(
+                now + self.http_max_age
+            )
         else:
-            now = fromtimestamp(now, UTC)
-            policy.modified = now
-            now = format_http_datetime(now)
-            policy.http_last_modified = now
-            policy.http_expires = now
-            policy.max_age_delta = 0
-        if self.http_vary is not None:
-            policy.vary(*self.http_vary)
+            policy.http_expires = policy.http_last_modified
         return policy
 
 
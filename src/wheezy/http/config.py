@@ -6,4 +6,7 @@ def bootstrap_http_defaults(options):
     options.setdefault("HTTP_COOKIE_SAMESITE", None)
     options.setdefault("HTTP_COOKIE_SECURE", False)
     options.setdefault("HTTP_COOKIE_HTTPONLY", False)
+    options.setdefault("JSON_CODEC", None)
+    options.setdefault("HTTP_QUERY_CACHE", None)
+    options.setdefault("HTTP_COOKIE_CACHE", None)
     return None
@@ -1,9 +1,6 @@
-from datetime import datetime, timezone
 from time import time
 
-from wheezy.core.datetime import format_http_datetime
-
-UTC = timezone.utc
+from wheezy.http.httpdate import format_http_datetime, utc_fromtimestamp
 
 
 class HTTPCookie(object):
@@ -44,7 +41,7 @@ class HTTPCookie(object):
         if max_age is None:
             self.expires = expires
         else:
-            self.expires = datetime.fromtimestamp(time() + max_age, UTC)
+            self.expires = utc_fromtimestamp(int(time()) + max_age)
         if domain is None:
             self.domain = options["HTTP_COOKIE_DOMAIN"]
         else:
@@ -0,0 +1,78 @@
+from calendar import timegm
+from datetime import datetime, timezone
+from functools import lru_cache
+from time import gmtime
+
+from wheezy.core.datetime import MONTHS, WEEKDAYS, parse_http_datetime as parse
+
+UTC = timezone.utc
+
+
+@lru_cache(maxsize=512)
+def format_http_timestamp(timestamp):
+    """Formats ``timestamp`` (seconds since epoch) to a string following
+    rfc1123 pattern. Memoized per second.
+
+    >>> format_http_timestamp(1316429130)
+    'Mon, 19 Sep 2011 10:45:30 GMT'
+    """
+    year, month, day, hh, mm, ss, wd, y, z = gmtime(timestamp)
+    return "%s, %02d %3s %4d %02d:%02d:%02d GMT" % (
+        WEEKDAYS[wd],
+        day,
+        MONTHS[month],
+        year,
+        hh,
+        mm,
+        ss,
+    )
+
+
+def format_http_datetime(stamp):
+    """Formats datetime to a string following rfc1123 pattern, a drop-in
+    replacement for ``wheezy.core.datetime.format_http_datetime``.
+
+    >>> format_http_datetime(datetime(2011, 9, 19, 10, 45, 30, 0, UTC))
+    'Mon, 19 Sep 2011 10:45:30 GMT'
+
+    if timezone is not set in datetime instance the ``stamp``
+    is assumed to be in UTC.
+
+    >>> format_http_datetime(datetime(2011, 9, 19, 10, 45, 30, 0))
+    'Mon, 19 Sep 2011 10:45:30 GMT'
+
+    if ``stamp`` is a string just return it
+
+    >>> format_http_datetime('x')
+    'x'
+    """
+    if isinstance(stamp, datetime):
+        return format_http_timestamp(timegm(stamp.utctimetuple()))
+    elif isinstance(stamp, str):
+        return stamp
+    else:
+        raise TypeError("Expecting type ``datetime.datetime``.")
+
+
+@lru_cache(maxsize=512)
+def utc_fromtimestamp(timestamp):
+    """Returns UTC datetime for ``timestamp``. Memoized per second.
+
+    >>> utc_fromtimestamp(1316429130)
+    datetime.datetime(2011, 9, 19, 10, 45, 30, tzinfo=datetime.timezone.utc)
+    """
+    return datetime.fromtimestamp(timestamp, UTC)
+
+
+@lru_cache(maxsize=256)
+def parse_http_datetime(stamp):
+    """Parses a string in rfc1123 format to ``datetime``. Results of
+    recent calls are memoized since clients repeat the same
+    If-Modified-Since value.
+
+    >>> parse_http_datetime('Mon, 19 Sep 2011 10:45:30 GMT')
+    datetime.datetime(2011, 9, 19, 10, 45, 30)
+
+    >>> parse_http_datetime('')
+    """
+    return parse(stamp)
@@ -0,0 +1,59 @@
+from json import loads as json_loads
+
+from wheezy.core.json import JSONEncoder, json_encode
+
+try:
+    import orjson
+except ImportError:  # pragma: nocover
+    orjson = None
+
+
+class JSONCodec(object):
+    """JSON codec that works with UTF-8 bytes, so there is no
+    intermediate str on the way to response or from request body.
+
+    ``dumps`` - a callable that encodes an object to bytes.
+    ``loads`` - a callable that decodes bytes to an object.
+    """
+
+    __slots__ = ("dumps", "loads")
+
+    def __init__(self, dumps, loads):
+        self.dumps = dumps
+        self.loads = loads
+
+
+def json_dumps(obj):
+    """Encodes ``obj`` to JSON UTF-8 bytes with ``wheezy.core.json``
+    rules.
+
+    >>> json_dumps({'x': '</'})
+    b'{"x":"<\\\\/"}'
+    """
+    return json_encode(obj).encode("UTF-8")
+
+
+json_codec = JSONCodec(json_dumps, json_loads)
+
+
+if orjson:
+    # datetime and decimal are encoded the same way as wheezy.core.json
+    orjson_default = JSONEncoder().default
+    orjson_options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def orjson_dumps(obj):
+        """Encodes ``obj`` to JSON UTF-8 bytes with orjson.
+
+        >>> orjson_dumps({'x': '</'})
+        b'{"x":"<\\\\/"}'
+        """
+        return orjson.dumps(
+            obj, default=orjson_default, option=orjson_options
+        ).replace(b"</", b"<\\/")
+
+    orjson_codec = JSONCodec(orjson_dumps, orjson.loads)
+else:  # pragma: nocover
+    orjson_codec = None
+
+# the fastest codec available
+fast_json_codec = orjson_codec or json_codec
@@ -1,4 +1,4 @@
-from wheezy.http.response import method_not_allowed
+from wheezy.http.response import HTTP_ERROR_RESPONSES
 
 
 def accept_method(constraint):
@@ -26,7 +26,7 @@ def accept_method(constraint):
 
             def one_of(request, *args, **kwargs):
                 if request.method not in constraint:
-                    return method_not_allowed()
+                    return HTTP_ERROR_RESPONSES[405]
                 return handler(request, *args, **kwargs)
 
             return one_of
@@ -34,7 +34,7 @@ def accept_method(constraint):
 
             def exact(request, *args, **kwargs):
                 if request.method != constraint:
-                    return method_not_allowed()
+                    return HTTP_ERROR_RESPONSES[405]
                 return handler(request, *args, **kwargs)
 
             return exact
@@ -1,16 +1,40 @@
-from datetime import timezone
-
-from wheezy.core.datetime import parse_http_datetime
+import os
+from collections import OrderedDict
+from mimetypes import guess_type
+from stat import S_ISREG
+from threading import Lock
 
 from wheezy.http.cache import (
     CacheableResponse,
     NotModifiedResponse,
     SurfaceResponse,
+    etag_match,
+    etag_stat,
+    modified_since,
+    range_response,
+    response_etag,
+    slice_chunks,
 )
 from wheezy.http.cacheprofile import RequestVary
-from wheezy.http.response import HTTPResponse
+from wheezy.http.httpdate import format_http_timestamp, utc_fromtimestamp
+from wheezy.http.response import (
+    HTTPErrorResponse,
+    HTTPFileResponse,
+    HTTPResponse,
+    HTTPStreamingResponse,
+    http_error,
+    read_blocks,
+)
+from wheezy.http.transforms import select_encoding
 
-UTC = timezone.utc
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+COMPRESSED_TYPES = {
+    "br": "application/x-brotli",
+    "bzip2": "application/x-bzip2",
+    "compress": "application/x-compress",
+    "gzip": "application/gzip",
+    "xz": "application/x-xz",
+}
 
 
 class HTTPCacheMiddleware(object):
@@ -41,25 +65,31 @@ class HTTPCacheMiddleware(object):
             if response:  # cache hit
                 environ = request.environ
                 if response.etag and "HTTP_IF_NONE_MATCH" in environ:
-                    if response.etag in environ["HTTP_IF_NONE_MATCH"]:
+                    if etag_match(
+                        response.etag, environ["HTTP_IF_NONE_MATCH"]
+                    ):
                         return NotModifiedResponse(response)
                 elif (
                     response.last_modified
                     and "HTTP_IF_MODIFIED_SINCE" in environ
                 ):
-                    modified_since = parse_http_datetime(
-                        environ["HTTP_IF_MODIFIED_SINCE"]
-                    )
-                    if modified_since is not None and (
-                        modified_since.replace(tzinfo=UTC)
-                        >= response.last_modified
+                    if not modified_since(
+                        environ["HTTP_IF_MODIFIED_SINCE"],
+                        response.last_modified,
                     ):
                         return NotModifiedResponse(response)
+                partial = buffer_range_response(
+                    request, response.headers, response.buffer
+                )
+                if partial is not None:
+                    return partial
                 return response
         response = following(request)
         if response and response.status_code == 200:
             cache_profile = response.cache_profile
-            if cache_profile:
+            if cache_profile and not isinstance(
+                response, (HTTPStreamingResponse, HTTPFileResponse)
+            ):
                 if (
                     middleware_key not in self.profiles
                     or cache_profile != self.profiles[middleware_key]
@@ -98,25 +128,44 @@ class HTTPCacheMiddleware(object):
                     )
                 environ = request.environ
                 if cacheable.etag and "HTTP_IF_NONE_MATCH" in environ:
-                    if cacheable.etag in environ["HTTP_IF_NONE_MATCH"]:
+                    if etag_match(
+                        cacheable.etag, environ["HTTP_IF_NONE_MATCH"]
+                    ):
                         return NotModifiedResponse(response)
                 elif (
                     cacheable.last_modified
                     and "HTTP_IF_MODIFIED_SINCE" in environ
                 ):
-                    modified_since = parse_http_datetime(
-                        environ["HTTP_IF_MODIFIED_SINCE"]
-                    )
-                    if modified_since is not None and (
-                        modified_since.replace(tzinfo=UTC)
-                        >= cacheable.last_modified
+                    if not modified_since(
+                        environ["HTTP_IF_MODIFIED_SINCE"],
+                        cacheable.last_modified,
                     ):
                         return NotModifiedResponse(response)
+                partial = buffer_range_response(
+                    request, response.headers, cacheable.buffer
+                )
+                if partial is not None:
+                    return partial
                 # the response already has all necessary headers
                 return SurfaceResponse(response)
         return response
 
 
+def buffer_range_response(request, headers, buffer):
+    """Returns partial content response for GET request with Range
+    header, ``buffer`` is a sequence of body chunks.
+    """
+    environ = request.environ
+    if "HTTP_RANGE" not in environ or request.method != "GET":
+        return None
+    return range_response(
+        environ,
+        headers,
+        sum([len(chunk) for chunk in buffer]),
+        lambda start, end: slice_chunks(buffer, start, end),
+    )
+
+
 def http_cache_middleware_factory(options):
     """HTTP cache middleware factory.
 
@@ -133,6 +182,76 @@ def http_cache_middleware_factory(options):
     return HTTPCacheMiddleware(cache=cache, middleware_vary=middleware_vary)
 
 
+class ConditionalGetMiddleware(object):
+    """Conditional GET middleware, returns HTTP 304 Not Modified
+    for any successful GET or HEAD response which cache policy has
+    ETag or Last-Modified that match request If-None-Match or
+    If-Modified-Since headers.
+    """
+
+    def __call__(self, request, following):
+        assert following
+        response = following(request)
+        if (
+            response
+            and response.status_code == 200
+            and request.method in ("GET", "HEAD")
+        ):
+            cache_policy = response.cache_policy
+            if cache_policy:
+                environ = request.environ
+                etag = cache_policy.http_etag
+                if etag and "HTTP_IF_NONE_MATCH" in environ:
+                    if etag_match(etag, environ["HTTP_IF_NONE_MATCH"]):
+                        return not_modified_response(response)
+                elif (
+                    cache_policy.modified
+                    and "HTTP_IF_MODIFIED_SINCE" in environ
+                ):
+                    if not modified_since(
+                        environ["HTTP_IF_MODIFIED_SINCE"],
+                        cache_policy.modified,
+                    ):
+                        return not_modified_response(response)
+        return response
+
+
+def not_modified_response(response):
+    """Returns HTTP 304 response with headers of ``response``,
+    the body is discarded.
+    """
+    if isinstance(response, HTTPResponse):
+        # the body of streaming or file response is never produced
+        response.extend_headers()
+    elif getattr(response, "headers", None) is None:
+        response = CapturedHeaders(response)
+    return NotModifiedResponse(response)
+
+
+class CapturedHeaders(object):
+    """Headers of WSGI ``response`` that are known only once it is
+    called, the body is closed without being read.
+    """
+
+    __slots__ = ("headers",)
+
+    def __init__(self, response):
+        """Initializes captured headers."""
+        self.headers = []
+        result = response(self.start_response)
+        close = getattr(result, "close", None)
+        if close is not None:
+            close()
+
+    def start_response(self, status, headers):
+        self.headers = headers
+
+
+def conditional_get_middleware_factory(options):
+    """Conditional GET middleware factory."""
+    return ConditionalGetMiddleware()
+
+
 class WSGIAdapterMiddleware(object):
     """WSGI adapter middleware."""
 
@@ -172,6 +291,13 @@ def wsgi_adapter_middleware_factory(options):
     return WSGIAdapterMiddleware(wsgi_app)
 
 
+CACHE_ENVIRON_KEYS = (
+    "wheezy.http.cache_policy",
+    "wheezy.http.cache_profile",
+    "wheezy.http.cache_dependency",
+)
+
+
 class EnvironCacheAdapterMiddleware(object):
     """WSGI environ cache adapter middleware."""
 
@@ -179,6 +305,11 @@ class EnvironCacheAdapterMiddleware(object):
         assert following
         response = following(request)
         environ = request.environ
+        if isinstance(response, HTTPErrorResponse) and any(
+            key in environ for key in CACHE_ENVIRON_KEYS
+        ):
+            # shared error response is immutable
+            response = http_error(response.status_code)
         policy = None
         if "wheezy.http.cache_policy" in environ:
             policy = environ["wheezy.http.cache_policy"]
@@ -189,9 +320,9 @@ class EnvironCacheAdapterMiddleware(object):
             if policy is None:
                 response.cache_policy = profile.cache_policy()
                 if profile.etag_func is not None:
-                    response.cache_policy.etag(
-                        profile.etag_func(response.buffer)
-                    )
+                    etag = response_etag(profile.etag_func, response)
+                    if etag is not None:
+                        response.cache_policy.etag(etag)
         if "wheezy.http.cache_dependency" in environ:
             response.cache_dependency = environ["wheezy.http.cache_dependency"]
         return response
@@ -200,3 +331,255 @@ class EnvironCacheAdapterMiddleware(object):
 def environ_cache_adapter_middleware_factory(options):
     """WSGI environ cache adapter middleware factory."""
     return EnvironCacheAdapterMiddleware()
+
+
+class StaticFilesMiddleware(object):
+    """Static files middleware, serves GET and HEAD requests which
+    path starts with one of the prefixes.
+    """
+
+    def __init__(
+        self,
+        paths,
+        max_age=3600,
+        encodings=("br", "gzip"),
+        cache_size=256,
+        cache_max_length=65536,
+    ):
+        """
+        ``paths`` - a dict where key is a path prefix and value is
+        a directory to serve files from.
+        ``max_age`` - HTTP Cache-Control max-age, in seconds.
+        ``encodings`` - precompressed file siblings (``.br``, ``.gz``)
+        served in preference order if accepted by client.
+        ``cache_size`` - the number of small files kept in memory.
+        ``cache_max_length`` - files up to this length, in bytes,
+        are kept in memory.
+        """
+        assert paths
+        self.paths = sorted(
+            [
+                (prefix, len(prefix), os.path.realpath(directory))
+                for prefix, directory in paths.items()
+            ],
+            key=lambda p: p[1],
+            reverse=True,
+        )
+        self.cache_control = "public, max-age=%d" % max_age
+        self.encodings = tuple(e for e in encodings if e in ENCODING_SUFFIXES)
+        self.cache_size = cache_size
+        self.cache_max_length = cache_max_length
+        self.cache = OrderedDict()
+        self.lock = Lock()
+
+    def __call__(self, request, following):
+        if request.method in ("GET", "HEAD"):
+            path = request.environ["PATH_INFO"]
+            for prefix, n, directory in self.paths:
+                if path.startswith(prefix):
+                    response = self.serve(request, directory, path[n:])
+                    if response is not None:
+                        return response
+                    break
+        if following is not None:
+            return following(request)
+        return None
+
+    def serve(self, request, directory, name):
+        """Returns response for file ``name`` in ``directory`` or
+        ``None`` if there is no such file.
+        """
+        path = resolve_path(directory, name)
+        if path is None:
+            return None
+        content_type, encoding = guess_type(path)
+        environ = request.environ
+        if encoding:
+            # compressed file (e.g. .tar.gz, .svgz) is sent as is, it
+            # has no precompressed siblings
+            content_type = COMPRESSED_TYPES.get(encoding)
+            st = stat_file(path)
+            encoding = vary = None
+        else:
+            path, st, encoding = self.select_file(path, environ)
+            vary = self.encodings
+        if st is None:
+            return None
+        etag = etag_stat(st)
+        mtime = int(st.st_mtime)
+        headers = [
+            ("Content-Type", content_type or "application/octet-stream"),
+            ("Content-Length", str(st.st_size)),
+            ("Cache-Control", self.cache_control),
+            ("Last-Modified", format_http_timestamp(mtime)),
+            ("ETag", etag),
+            ("Accept-Ranges", "bytes"),
+        ]
+        if encoding:
+            headers.append(("Content-Encoding", encoding))
+        if vary:
+            headers.append(("Vary", "Accept-Encoding"))
+        response = StaticFileResponse(headers)
+        if not_modified(environ, etag, mtime):
+            return NotModifiedResponse(response)
+        if request.method == "HEAD":
+            response.buffer = ()
+            return response
+        return self.respond(request, response, path, st)
+
+    def respond(self, request, response, path, st):
+        """Sets the body of ``response`` to the content of file
+        ``path``, returns partial content response if the request has
+        a satisfiable Range header.
+        """
+        environ = request.environ
+        if st.st_size <= self.cache_max_length:
+            response.buffer = (self.read(path, st),)
+            partial = buffer_range_response(
+                request, response.headers, response.buffer
+            )
+        elif "HTTP_RANGE" in environ:
+            partial = range_response(
+                environ,
+                response.headers,
+                st.st_size,
+                lambda start, end: read_range(path, start, end),
+            )
+        else:
+            partial = None
+        if partial is not None:
+            return partial
+        if not response.buffer:
+            response.path = path
+            response.file_wrapper = environ.get("wsgi.file_wrapper")
+        return response
+
+    def select_file(self, path, environ):
+        """Returns a tuple: path, stat and content encoding of the
+        file to serve, a precompressed sibling is preferred if it is
+        acceptable by client.
+        """
+        st = stat_file(path)
+        if st is None or not self.encodings:
+            return path, st, None
+        if "HTTP_ACCEPT_ENCODING" not in environ:
+            return path, st, None
+        encoding = self.select_encoding(path, environ["HTTP_ACCEPT_ENCODING"])
+        if encoding is None:
+            return path, st, None
+        path += ENCODING_SUFFIXES[encoding]
+        return path, stat_file(path), encoding
+
+    def select_encoding(self, path, accept_encoding):
+        """Selects the best precompressed sibling of file ``path``
+        acceptable by client.
+        """
+        available = [
+            e
+            for e in self.encodings
+            if stat_file(path + ENCODING_SUFFIXES[e]) is not None
+        ]
+        if not available:
+            return None
+        return select_encoding(accept_encoding, available)
+
+    def read(self, path, st):
+        """Returns the content of small file, recently used files
+        are kept in memory.
+        """
+        key = (st.st_mtime_ns, st.st_size)
+        cache = self.cache
+        with self.lock:
+            entry = cache.get(path)
+            if entry is not None and entry[0] == key:
+                cache.move_to_end(path)
+                return entry[1]
+        with open(path, "rb") as f:
+            content = f.read()
+        with self.lock:
+            cache[path] = (key, content)
+            cache.move_to_end(path)
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return content
+
+
+def not_modified(environ, etag, mtime):
+    if "HTTP_IF_NONE_MATCH" in environ:
+        return etag_match(etag, environ["HTTP_IF_NONE_MATCH"])
+    if "HTTP_IF_MODIFIED_SINCE" in environ:
+        return not modified_since(
+            environ["HTTP_IF_MODIFIED_SINCE"], utc_fromtimestamp(mtime)
+        )
+    return False
+
+
+def resolve_path(directory, name):
+    """Returns a real path of the file ``name`` (WSGI PATH_INFO
+    part) or ``None`` if it refers outside of ``directory``.
+    """
+    if not name or "\0" in name:
+        return None
+    try:
+        name = name.encode("latin1").decode("utf-8")
+    except UnicodeError:
+        return None
+    path = os.path.realpath(os.path.join(directory, name.lstrip("/")))
+    if not path.startswith(directory + os.sep):
+        return None
+    return path
+
+
+def stat_file(path):
+    """Returns ``os.stat`` result for the regular file ``path``."""
+    try:
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if not S_ISREG(st.st_mode):
+        return None
+    return st
+
+
+class StaticFileResponse(object):
+    """Static file response."""
+
+    status_code = 200
+    cache_policy = None
+    cache_profile = None
+    buffer = None
+    path = None
+    file_wrapper = None
+    block_size = 65536
+
+    def __init__(self, headers):
+        """Initializes static file response."""
+        self.headers = headers
+
+    def __call__(self, start_response):
+        """WSGI call processing."""
+        start_response("200 OK", self.headers)
+        if self.path is None:
+            return self.buffer
+        f = open(self.path, "rb")
+        if self.file_wrapper is not None:
+            return self.file_wrapper(f, self.block_size)
+        return read_blocks(f, self.block_size)
+
+
+def read_range(path, start, end, block_size=65536):
+    """Reads file ``path`` by blocks in range from ``start`` to
+    ``end`` (exclusive).
+    """
+    f = open(path, "rb")
+    f.seek(start)
+    yield from read_blocks(f, block_size, end - start)
+
+
+def static_files_middleware_factory(options):
+    """Static files middleware factory.
+
+    Requires ``static_files`` in options, a dict where key is a path
+    prefix and value is a directory to serve files from.
+    """
+    return StaticFilesMiddleware(options["static_files"])
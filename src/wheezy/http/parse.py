@@ -1,3 +1,10 @@
+import re
+from codecs import getincrementaldecoder
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from functools import lru_cache
+from json import JSONDecoder
+from threading import Lock
 from urllib.parse import unquote
 
 try:
@@ -6,30 +13,295 @@ except ImportError:
     from wheezy.http._cgi import FieldStorage
 
 MULTIPART_ENVIRON = {"REQUEST_METHOD": "POST"}
+MAX_RANGES = 16
+LAZY_QUERY_MIN_LENGTH = 128
+RE_QS_ESCAPED_DELIMITER = re.compile("%(?:26|2[Cc]|3[Dd])")
+RE_JSON_WS = re.compile(r"[ \t\n\r]*")
+RE_JSON_STRUCTURE = re.compile(r'["\[\]{}]')
+RE_JSON_STRING_SPECIAL = re.compile(r'["\\]')
+RE_JSON_SCALAR_END = re.compile(r"[ \t\n\r,\]}]")
 
 
 def parse_qs(qs):
+    """Parses query string ``qs`` into a dict of lists of values,
+    comma separated values of the first occurrence are split.
+
+    >>> parse_qs('a=1,2&a=3,4&b=x+y%21')
+    {'a': ['1', '2', '3,4'], 'b': ['x y!']}
+    """
+    if "+" in qs:
+        qs = qs.replace("+", " ")
+    if "%" in qs:
+        if RE_QS_ESCAPED_DELIMITER.search(qs) is not None:
+            return parse_qs_escaped(qs)
+        # no escaped delimiters, so the whole string is unquoted in one
+        # pass; decoding errors are replaced the same way per field.
+        qs = unquote(qs)
+    params = {}
+    for field in qs.split("&"):
+        k, _, v = field.partition("=")
+        if k in params:
+            params[k].append(v)
+        elif "," in v:
+            params[k] = v.split(",")
+        else:
+            params[k] = [v]
+    return params
+
+
+def parse_qs_escaped(qs):
     params = {}
+    for field in qs.split("&"):
+        k, _, v = field.partition("=")
+        if "%" in k:
+            k = unquote(k)
+        if k in params:
+            params[k].append("%" in v and unquote(v) or v)
+        elif "%" not in v:
+            params[k] = v.split(",")
+        else:
+            params[k] = [unquote(x) for x in v.split(",")]
+    return params
+
+
+def parse_qs_value(qs, name):
+    """Returns a list of values of ``name`` in query string ``qs``
+    the same way as ``parse_qs(qs).get(name)`` does, but only the
+    values of ``name`` are decoded.
+
+    >>> parse_qs_value('a=1&b=2,3&b=4,%35', 'b')
+    ['2', '3', '4,5']
+    >>> parse_qs_value('a=1', 'b')
+    """
+    if name not in qs and "%" not in qs and "+" not in qs:
+        return None
+    values = None
     for field in qs.split("&"):
         r = field.partition("=")
         k = r[0]
-        v = r[2]
         if "+" in k:
             k = k.replace("+", " ")
         if "%" in k:
             k = unquote(k)
+        if k != name:
+            continue
+        v = r[2]
         if "+" in v:
             v = v.replace("+", " ")
-        if k in params:
-            params[k].append("%" in v and unquote(v) or v)
+        if values is not None:
+            values.append("%" in v and unquote(v) or v)
+        elif "," in v:
+            values = [("%" in v and unquote(x) or x) for x in v.split(",")]
         else:
-            if "," in v:
-                params[k] = [
-                    ("%" in v and unquote(x) or x) for x in v.split(",")
-                ]
-            else:
-                params[k] = ["%" in v and unquote(v) or v]
-    return params
+            values = ["%" in v and unquote(v) or v]
+    return values
+
+
+def fill_first(method):
+    """Wraps ``dict`` method of ``LazyQuery`` that needs all items."""
+
+    def fill(self, *args, **kwargs):
+        return method(self.materialize(), *args, **kwargs)
+
+    fill.__name__ = method.__name__
+    fill.__doc__ = method.__doc__
+    return fill
+
+
+class LazyQuery(dict):
+    """A dict of query string ``qs`` values (see ``parse_qs``) that is
+    filled lazily: a lookup scans for the requested key and decodes
+    only its values, the dict is filled on iteration, modification or
+    any other access to all items. A query string shorter than
+    ``LAZY_QUERY_MIN_LENGTH`` is parsed at once.
+    """
+
+    __slots__ = ("qs", "missing")
+
+    def __init__(self, qs):
+        self.qs = qs
+        if len(qs) < LAZY_QUERY_MIN_LENGTH:
+            # a short query string is cheaper to parse at once
+            super(LazyQuery, self).__init__(parse_qs(qs))
+            self.missing = None
+            return
+        super(LazyQuery, self).__init__()
+        # names known to be absent, None once the dict is filled
+        self.missing = set()
+        # C code (e.g. json encoder) treats a dict with no items as
+        # empty without calling its methods, while a query string has
+        # at least one field
+        k = qs.partition("&")[0].partition("=")[0]
+        if "+" in k:
+            k = k.replace("+", " ")
+        if "%" in k:
+            k = unquote(k)
+        self.lookup(k)
+
+    def lookup(self, name):
+        """Returns values of ``name`` that is not in the dict yet."""
+        missing = self.missing
+        if missing is None or name in missing:
+            return None
+        values = parse_qs_value(self.qs, name)
+        if values is None:
+            missing.add(name)
+        else:
+            dict.__setitem__(self, name, values)
+        return values
+
+    def materialize(self):
+        if self.missing is not None:
+            self.missing = None
+            params = parse_qs(self.qs)
+            # keep lists that are already returned
+            params.update(dict.items(self))
+            dict.clear(self)
+            dict.update(self, params)
+        return self
+
+    def __getitem__(self, name):
+        r = dict.get(self, name)
+        if r is None:
+            r = self.lookup(name)
+            if r is None:
+                raise KeyError(name)
+        return r
+
+    def get(self, name, default=None):
+        r = dict.get(self, name)
+        if r is None:
+            r = self.lookup(name)
+            if r is None:
+                return default
+        return r
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or (self.lookup(name) is not None)
+
+    __iter__ = fill_first(dict.__iter__)
+    __reversed__ = fill_first(dict.__reversed__)
+    __len__ = fill_first(dict.__len__)
+    __repr__ = fill_first(dict.__repr__)
+    __eq__ = fill_first(dict.__eq__)
+    __ne__ = fill_first(dict.__ne__)
+    __or__ = fill_first(dict.__or__)
+    __ror__ = fill_first(dict.__ror__)
+    __ior__ = fill_first(dict.__ior__)
+    __setitem__ = fill_first(dict.__setitem__)
+    __delitem__ = fill_first(dict.__delitem__)
+    keys = fill_first(dict.keys)
+    values = fill_first(dict.values)
+    items = fill_first(dict.items)
+    copy = fill_first(dict.copy)
+    pop = fill_first(dict.pop)
+    popitem = fill_first(dict.popitem)
+    setdefault = fill_first(dict.setdefault)
+    update = fill_first(dict.update)
+    clear = fill_first(dict.clear)
+
+
+class CopyOnWriteDict(MutableMapping):
+    """A dict that shares ``data`` with other instances until it is
+    modified, then it works with its own copy.
+    """
+
+    __slots__ = ("data", "shared")
+
+    def __init__(self, data):
+        self.data = data
+        self.shared = True
+
+    def own(self):
+        if self.shared:
+            self.data = dict(self.data)
+            self.shared = False
+        return self.data
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def get(self, name, default=None):
+        return self.data.get(name, default)
+
+    def __contains__(self, name):
+        return name in self.data
+
+    def __setitem__(self, name, value):
+        self.own()[name] = value
+
+    def __delitem__(self, name):
+        del self.own()[name]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return repr(self.data)
+
+
+class ParseCache(object):
+    """Bounded LRU cache in front of ``parse`` (e.g. ``parse_qs``,
+    ``parse_cookie``), so repeated identical inputs are parsed once.
+
+    Parsed results are shared between callers and returned as
+    ``CopyOnWriteDict``; ``freeze`` makes the shared result
+    immutable (e.g. converts lists to tuples). Inputs longer than
+    ``max_length`` are not cached. ``hits`` and ``misses`` count
+    cache lookups.
+    """
+
+    def __init__(self, parse, maxsize=256, max_length=4096, freeze=None):
+        self.parse = parse
+        self.maxsize = maxsize
+        self.max_length = max_length
+        self.freeze = freeze
+        self.cache = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __call__(self, value):
+        cache = self.cache
+        with self.lock:
+            data = cache.get(value)
+            if data is not None:
+                cache.move_to_end(value)
+                self.hits += 1
+                return CopyOnWriteDict(data)
+            self.misses += 1
+        data = self.parse(value)
+        if self.freeze is not None:
+            data = self.freeze(data)
+        if len(value) <= self.max_length:
+            with self.lock:
+                cache[value] = data
+                if len(cache) > self.maxsize:
+                    cache.popitem(last=False)
+        return CopyOnWriteDict(data)
+
+
+def freeze_values(params):
+    """Converts lists of ``params`` values to tuples."""
+    return {name: tuple(values) for name, values in params.items()}
+
+
+def query_cache(maxsize=256, max_length=4096):
+    """Returns ``ParseCache`` for ``parse_qs``, the values are
+    tuples.
+    """
+    return ParseCache(parse_qs, maxsize, max_length, freeze_values)
+
+
+def cookie_cache(maxsize=256, max_length=4096):
+    """Returns ``ParseCache`` for ``parse_cookie``."""
+    return ParseCache(parse_cookie, maxsize, max_length)
 
 
 def parse_multipart(fp, ctype, clength, encoding):
@@ -73,3 +345,299 @@ def parse_cookie(cookie):
         result[name] = value.strip()
 
     return result
+
+
+def parse_accept(value):
+    """Parse Accept-* header value and return a list of tuples
+    (token, quality) ordered by quality, the header order is
+    preserved for equal quality. Tokens are in lower case.
+
+    >>> parse_accept("gzip;q=0.5, br, identity;q=0")
+    [('br', 1.0), ('gzip', 0.5), ('identity', 0.0)]
+    """
+    result = []
+    for item in value.split(","):
+        token, sep, params = item.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        if sep:
+            for param in params.split(";"):
+                name, sep, v = param.partition("=")
+                if name.strip() == "q":
+                    try:
+                        q = float(v)
+                    except ValueError:
+                        q = 0.0
+        result.append((token, q))
+    result.sort(key=quality, reverse=True)
+    return result
+
+
+def quality(item):
+    return item[1]
+
+
+@lru_cache(maxsize=512)
+def accept_values(value):
+    """Returns ``parse_accept(value)`` as a tuple, memoized in a
+    process-wide LRU cache keyed on the raw header value, so common
+    browser headers are parsed once.
+
+    >>> accept_values("en-US,en;q=0.9")
+    (('en-us', 1.0), ('en', 0.9))
+    """
+    return tuple(parse_accept(value))
+
+
+@lru_cache(maxsize=1024)
+def negotiate(value, offers):
+    """Selects the best of ``offers`` (a tuple in server preference
+    order) acceptable according to Accept-* header ``value``, or
+    ``None`` if none is acceptable. The first offer is selected if
+    the header is missing (``value`` is ``None``). The most specific
+    range matching an offer wins: exact token, media type range
+    (``text/*``), language prefix (``en`` for ``en-GB``), then
+    ``*`` or ``*/*``. Results are memoized.
+
+    >>> negotiate("text/html, application/json;q=0.9, */*;q=0.1",
+    ...           ("application/json", "text/html"))
+    'text/html'
+    >>> negotiate("de-CH, en;q=0.5", ("en-GB", "fr"))
+    'en-GB'
+    >>> negotiate("gzip;q=0, *", ("gzip",))
+    >>> negotiate(None, ("br", "gzip"))
+    'br'
+    """
+    if value is None:
+        return offers and offers[0] or None
+    accepted = dict(accept_values(value))
+    best = None
+    best_q = 0.0
+    for offer in offers:
+        q = accept_quality(accepted, offer.lower())
+        if q > best_q:
+            best = offer
+            best_q = q
+    return best
+
+
+def accept_quality(accepted, token):
+    q = accepted.get(token)
+    if q is not None:
+        return q
+    if "/" in token:
+        q = accepted.get(token.split("/", 1)[0] + "/*")
+        if q is not None:
+            return q
+        return accepted.get("*/*", accepted.get("*", 0.0))
+    while "-" in token:
+        token = token.rsplit("-", 1)[0]
+        q = accepted.get(token)
+        if q is not None:
+            return q
+    return accepted.get("*", 0.0)
+
+
+def parse_range(value, length):
+    """Parse Range header value for a representation of ``length``
+    bytes. Returns a list of tuples (start, end), where end is
+    exclusive, an empty list if none of ranges is satisfiable or
+    ``None`` if the header is malformed or not supported.
+
+    >>> parse_range("bytes=0-4, 10-, -3", 20)
+    [(0, 5), (10, 20), (17, 20)]
+    >>> parse_range("bytes=20-", 20)
+    []
+    >>> parse_range("items=0-4", 20)
+    """
+    unit, sep, ranges = value.partition("=")
+    if not sep or unit.strip().lower() != "bytes":
+        return None
+    ranges = [r.strip() for r in ranges.split(",") if r.strip()]
+    if not ranges or len(ranges) > MAX_RANGES:
+        return None
+    result = []
+    for spec in ranges:
+        r = parse_byte_range(spec, length)
+        if r is None:
+            return None
+        start, end = r
+        if start < length:
+            result.append((start, min(end, length)))
+    return result
+
+
+def parse_byte_range(spec, length):
+    """Parse a single byte range ``spec`` and returns a tuple
+    (start, end) or ``None`` if it is malformed.
+    """
+    first, sep, last = spec.partition("-")
+    first = first.strip()
+    last = last.strip()
+    digits = first + last
+    # str.isdigit() is true for non-ASCII digits, e.g. superscripts
+    if not sep or not digits.isascii() or not digits.isdecimal():
+        return None
+    if not first:
+        return max(length - int(last), 0), length
+    start = int(first)
+    if not last:
+        return start, length
+    end = int(last) + 1
+    if end <= start:
+        return None
+    return start, end
+
+
+def parse_json_items(blocks, encoding="UTF-8"):
+    """Parses a JSON array from an iterable of bytes ``blocks``
+    incrementally and yields its items, so memory is bounded by the
+    size of an item rather than the whole document. Each item is
+    scanned for completeness before it is decoded, thus the cost is
+    linear regardless of block size. Raises ``ValueError`` if the
+    document is not a JSON array or there is anything but whitespace
+    after it.
+
+    >>> list(parse_json_items([b' [1, {"a"', b': 2}, "x"', b'] ']))
+    [1, {'a': 2}, 'x']
+    >>> list(parse_json_items([b'[]']))
+    []
+    """
+    texts = decode_blocks(blocks, encoding)
+    raw_decode = JSONDecoder().raw_decode
+    buf = ""
+    pos = 0
+    # the next expected token: "[", "value" (or "]" for empty array),
+    # "item" (value after comma) or "," (or "]")
+    expected = "["
+    while True:
+        pos = RE_JSON_WS.match(buf, pos).end()
+        if pos == len(buf):
+            buf = next(texts, None)
+            if buf is None:
+                raise ValueError("Incomplete JSON array")
+            pos = 0
+            continue
+        if expected == ",":
+            if buf[pos] == "]":
+                expect_end(buf, pos + 1, texts)
+                return
+            expected = expect_token(buf[pos], ",", "item")
+            pos += 1
+            continue
+        if expected == "[":
+            expected = expect_token(buf[pos], "[", "value")
+            pos += 1
+            continue
+        if expected == "value" and buf[pos] == "]":
+            expect_end(buf, pos + 1, texts)
+            return
+        buf, pos = read_value(buf, pos, texts)
+        item, pos = raw_decode(buf, pos)
+        yield item
+        expected = ","
+
+
+def decode_blocks(blocks, encoding):
+    decoder = getincrementaldecoder(encoding)()
+    for block in blocks:
+        yield decoder.decode(block)
+    yield decoder.decode(b"", True)
+
+
+def expect_token(c, token, expected):
+    if c != token:
+        raise ValueError("Expecting '%s' in JSON array" % token)
+    return expected
+
+
+def expect_end(buf, pos, texts):
+    """Ensures there is only whitespace after JSON array."""
+    while True:
+        pos = RE_JSON_WS.match(buf, pos).end()
+        if pos < len(buf):
+            raise ValueError("Extra data after JSON array")
+        buf = next(texts, None)
+        if buf is None:
+            return
+        pos = 0
+
+
+def read_value(buf, pos, texts):
+    """Ensures a JSON value that starts at ``pos`` in ``buf`` is
+    complete, reading more ``texts`` if necessary. Returns a tuple
+    (buf, pos) with the value at ``pos``.
+    """
+    scanner = JSONValueScanner(buf[pos])
+    if scanner.scan(buf, pos) >= 0:
+        return buf, pos
+    parts = [buf[pos:]]
+    for text in texts:
+        parts.append(text)
+        if scanner.scan(text, 0) >= 0:
+            break
+    else:
+        # a number, true, false or null may end with the input
+        if not scanner.scalar:
+            raise ValueError("Incomplete JSON array")
+    return "".join(parts), 0
+
+
+class JSONValueScanner(object):
+    """Tracks nesting depth and string state of a JSON value across
+    text parts to find where the value ends.
+    """
+
+    __slots__ = ("scalar", "depth", "in_string", "escape")
+
+    def __init__(self, c):
+        self.scalar = c not in '"[{'
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def scan(self, text, i):
+        """Scans ``text`` from ``i``, returns a position where the
+        value ends or -1 if it continues past the end of ``text``.
+        """
+        if self.scalar:
+            m = RE_JSON_SCALAR_END.search(text, i)
+            return m.start() if m else -1
+        while True:
+            if self.in_string:
+                i = self.scan_string(text, i)
+                if i < 0:
+                    return -1
+            else:
+                m = RE_JSON_STRUCTURE.search(text, i)
+                if m is None:
+                    return -1
+                i = m.end()
+                c = m.group()
+                if c == '"':
+                    self.in_string = True
+                    continue
+                self.depth += 1 if c in "[{" else -1
+            if not self.depth:
+                return i
+
+    def scan_string(self, text, i):
+        """Scans ``text`` from ``i`` inside a string, returns a position
+        after the closing quote or -1.
+        """
+        while True:
+            if self.escape:
+                if i >= len(text):
+                    return -1
+                self.escape = False
+                i += 1
+            m = RE_JSON_STRING_SPECIAL.search(text, i)
+            if m is None:
+                return -1
+            i = m.end()
+            if m.group() == '"':
+                self.in_string = False
+                return i
+            self.escape = True
@@ -1,127 +1,309 @@
 from json import loads as json_loads
 
-from wheezy.core.descriptors import attribute
 from wheezy.core.url import UrlParts
 
-from wheezy.http.parse import parse_cookie, parse_multipart, parse_qs
+from wheezy.http.parse import (
+    LazyQuery,
+    accept_values,
+    parse_cookie,
+    parse_json_items,
+    parse_multipart,
+    parse_qs,
+)
+
+UNSET = object()
 
 
 class HTTPRequest(object):
     """Represent HTTP request. ``environ`` variables
     are accessable via attributes.
+
+    Attributes are slots, those that cost to evaluate are evaluated
+    once on first access.
     """
 
+    __slots__ = (
+        "environ",
+        "encoding",
+        "options",
+        "method",
+        "_host",
+        "_remote_addr",
+        "_query",
+        "_form",
+        "_files",
+        "_cookies",
+        "_accept",
+        "_accept_encoding",
+        "_accept_language",
+        "_urlparts",
+    )
+
     def __init__(self, environ, encoding, options):
         self.environ = environ
         self.encoding = encoding
         self.options = options
         self.method = environ["REQUEST_METHOD"]
+        self._host = self._remote_addr = self._query = UNSET
+        self._form = self._files = self._cookies = UNSET
+        self._accept = self._accept_encoding = self._accept_language = UNSET
+        self._urlparts = UNSET
 
-    @attribute
+    @property
     def host(self):
-        host = self.environ["HTTP_HOST"]
-        if "," in host:
-            host = host.rsplit(",", 1)[-1].strip()
+        host = self._host
+        if host is UNSET:
+            host = self.environ["HTTP_HOST"]
+            if "," in host:
+                host = host.rsplit(",", 1)[-1].strip()
+            self._host = host
         return host
 
-    @attribute
+    @property
     def remote_addr(self):
-        addr = self.environ["REMOTE_ADDR"]
-        if "," in addr:
-            addr = addr.split(",", 1)[0].strip()
+        addr = self._remote_addr
+        if addr is UNSET:
+            addr = self.environ["REMOTE_ADDR"]
+            if "," in addr:
+                addr = addr.split(",", 1)[0].strip()
+            self._remote_addr = addr
         return addr
 
-    @attribute
+    @property
     def root_path(self):
         return self.environ["SCRIPT_NAME"] + "/"
 
-    @attribute
+    @property
     def path(self):
         return self.environ["SCRIPT_NAME"] + self.environ["PATH_INFO"]
 
-    @attribute
+    @property
     def query(self):
-        return parse_qs(self.environ["QUERY_STRING"])
+        query = self._query
+        if query is UNSET:
+            cache = self.options.get("HTTP_QUERY_CACHE")
+            if cache is not None:
+                query = cache(self.environ["QUERY_STRING"])
+            else:
+                query = LazyQuery(self.environ["QUERY_STRING"])
+            self._query = query
+        return query
 
     def get_param(self, name):
         p = self.query.get(name)
         return p and p[-1]
 
-    @attribute
+    @property
     def form(self):
-        form, self.files = self.load_body()
-        return form
+        if self._form is UNSET:
+            self._form, self._files = self.load_body()
+        return self._form
 
-    @attribute
+    @property
     def files(self):
-        self.form, files = self.load_body()
-        return files
+        if self._files is UNSET:
+            self._form, self._files = self.load_body()
+        return self._files
 
-    @attribute
+    @property
     def cookies(self):
-        if "HTTP_COOKIE" in self.environ:
-            return parse_cookie(self.environ["HTTP_COOKIE"])
-        else:
-            return {}
+        cookies = self._cookies
+        if cookies is UNSET:
+            environ = self.environ
+            if "HTTP_COOKIE" in environ:
+                cache = self.options.get("HTTP_COOKIE_CACHE")
+                if cache is not None:
+                    cookies = cache(environ["HTTP_COOKIE"])
+                else:
+                    cookies = parse_cookie(environ["HTTP_COOKIE"])
+            else:
+                cookies = {}
+            self._cookies = cookies
+        return cookies
+
+    @property
+    def accept(self):
+        accept = self._accept
+        if accept is UNSET:
+            accept = self._accept = accept_header(self.environ, "HTTP_ACCEPT")
+        return accept
+
+    @property
+    def accept_encoding(self):
+        accept = self._accept_encoding
+        if accept is UNSET:
+            accept = self._accept_encoding = accept_header(
+                self.environ, "HTTP_ACCEPT_ENCODING"
+            )
+        return accept
+
+    @property
+    def accept_language(self):
+        accept = self._accept_language
+        if accept is UNSET:
+            accept = self._accept_language = accept_header(
+                self.environ, "HTTP_ACCEPT_LANGUAGE"
+            )
+        return accept
 
-    @attribute
+    @property
     def ajax(self):
         if "HTTP_X_REQUESTED_WITH" in self.environ:
             return self.environ["HTTP_X_REQUESTED_WITH"] == "XMLHttpRequest"
         else:
             return False
 
-    @attribute
+    @property
     def secure(self):
         return self.environ["wsgi.url_scheme"] == "https"
 
-    @attribute
+    @property
     def scheme(self):
         return self.environ["wsgi.url_scheme"]
 
-    @attribute
+    @property
     def urlparts(self):
-        return UrlParts(
-            (
-                self.scheme,
-                self.host,
-                self.path,
-                self.environ["QUERY_STRING"],
-                None,
+        urlparts = self._urlparts
+        if urlparts is UNSET:
+            urlparts = self._urlparts = UrlParts(
+                (
+                    self.scheme,
+                    self.host,
+                    self.path,
+                    self.environ["QUERY_STRING"],
+                    None,
+                )
             )
-        )
+        return urlparts
 
-    @attribute
+    @property
     def content_type(self):
         return self.environ["CONTENT_TYPE"]
 
-    @attribute
+    @property
     def content_length(self):
-        return int(self.environ["CONTENT_LENGTH"])
+        return body_length(self.environ)
 
-    @attribute
+    @property
     def stream(self):
         return self.environ["wsgi.input"]
 
+    def iter_body(self, block_size=65536):
+        """Returns an iterator over http request body blocks. Raises
+        ``ValueError`` once the bytes read exceed maximum content
+        length.
+        """
+        return read_body(
+            self.environ["wsgi.input"],
+            body_length(self.environ),
+            self.options["MAX_CONTENT_LENGTH"],
+            block_size,
+        )
+
+    def iter_json(self, block_size=65536):
+        """Returns an iterator over items of JSON array http request
+        body, parsed incrementally in bounded memory.
+        """
+        return parse_json_items(self.iter_body(block_size), self.encoding)
+
     def load_body(self):
         """Load http request body and returns
         form data and files.
         """
         environ = self.environ
-        cl = environ["CONTENT_LENGTH"]
-        icl = int(cl)
-        if icl > self.options["MAX_CONTENT_LENGTH"]:
+        length = body_length(environ)
+        if length is None:
+            # terminated input, read until EOF
+            fp = LimitedInput(
+                environ["wsgi.input"], self.options["MAX_CONTENT_LENGTH"]
+            )
+            length = -1
+        elif length > self.options["MAX_CONTENT_LENGTH"]:
             raise ValueError("Maximum content length exceeded")
-        fp = environ["wsgi.input"]
+        else:
+            fp = environ["wsgi.input"]
         ct = environ["CONTENT_TYPE"]
         # application/x-www-form-urlencoded
         if "/x" in ct:
-            return parse_qs(fp.read(icl).decode(self.encoding)), None
+            return parse_qs(fp.read(length).decode(self.encoding)), None
         # application/json
         elif "/j" in ct:
-            return json_loads(fp.read(icl).decode(self.encoding)), None
+            codec = self.options.get("JSON_CODEC")
+            if codec is not None:
+                return codec.loads(fp.read(length)), None
+            return json_loads(fp.read(length).decode(self.encoding)), None
         # multipart/form-data
         elif ct.startswith("m"):
-            return parse_multipart(fp, ct, cl, self.encoding)
+            return parse_multipart(fp, ct, str(length), self.encoding)
         else:
             return None, None
+
+
+def accept_header(environ, name):
+    """Returns a tuple of (token, quality) pairs of Accept-* http
+    request header ``name`` ordered by quality, see ``accept_values``.
+    """
+    value = environ.get(name)
+    if value is None:
+        return ()
+    return accept_values(value)
+
+
+def body_length(environ):
+    """Returns http request body length or ``None`` if it is unknown
+    and input stream is terminated (e.g. chunked transfer encoding).
+    """
+    cl = environ.get("CONTENT_LENGTH")
+    if cl:
+        return int(cl)
+    if environ.get("wsgi.input_terminated"):
+        return None
+    return 0
+
+
+def read_body(fp, length, max_length, block_size=65536):
+    """Reads ``length`` bytes (or until EOF if it is ``None``) of
+    input stream ``fp`` by blocks of ``block_size``, no more than
+    ``max_length`` bytes are ever read.
+    """
+    if length is None:
+        fp = LimitedInput(fp, max_length)
+        length = max_length + 1
+    elif length > max_length:
+        raise ValueError("Maximum content length exceeded")
+    while length > 0:
+        block = fp.read(min(block_size, length))
+        if not block:
+            break
+        length -= len(block)
+        yield block
+
+
+class LimitedInput(object):
+    """Wraps terminated input stream ``fp`` of unknown length, raises
+    ``ValueError`` once more than ``max_length`` bytes are read.
+    """
+
+    __slots__ = ("fp", "remaining")
+
+    def __init__(self, fp, max_length):
+        self.fp = fp
+        self.remaining = max_length
+
+    def read(self, size=-1):
+        return self.check(self.fp.read(self.limit(size)))
+
+    def readline(self, size=-1):
+        return self.check(self.fp.readline(self.limit(size)))
+
+    def limit(self, size):
+        # read at most one byte over the limit to detect it
+        if size is None or size < 0 or size > self.remaining:
+            return self.remaining + 1
+        return size
+
+    def check(self, data):
+        self.remaining -= len(data)
+        if self.remaining < 0:
+            raise ValueError("Maximum content length exceeded")
+        return data
@@ -1,3 +1,7 @@
+import os
+from io import BytesIO
+from mimetypes import guess_type
+
 from wheezy.core.json import json_encode
 
 # see http://www.w3.org/Protocols/rfc2616/rfc2616-sec10.html
@@ -52,6 +56,53 @@ HTTP_STATUS = {
 }
 
 HTTP_HEADER_CACHE_CONTROL_DEFAULT = ("Cache-Control", "private")
+HTTP_HEADER_CONTENT_TYPE_DEFAULT = ("Content-Type", "text/html; charset=UTF-8")
+COALESCE_SIZE = 16384
+
+# interned header tuples, so they are not built per response; the
+# number of entries is bounded
+MAX_INTERNED_HEADERS = 1024
+CONTENT_LENGTH_HEADERS = {}
+HEADER_PREFIXES = {}
+
+
+def content_length_header(length):
+    """Returns an interned Content-Length header tuple.
+
+    >>> content_length_header(10) is content_length_header(10)
+    True
+    """
+    header = CONTENT_LENGTH_HEADERS.get(length)
+    if header is None:
+        header = ("Content-Length", str(length))
+        if len(CONTENT_LENGTH_HEADERS) < MAX_INTERNED_HEADERS:
+            CONTENT_LENGTH_HEADERS[length] = header
+    return header
+
+
+def header_prefix(content_type):
+    """Returns an interned tuple of Content-Type and default
+    Cache-Control headers, the headers every response without cache
+    policy starts with.
+
+    >>> header_prefix('text/plain')
+    (('Content-Type', 'text/plain'), ('Cache-Control', 'private'))
+    """
+    prefix = HEADER_PREFIXES.get(content_type)
+    if prefix is None:
+        prefix = (
+            ("Content-Type", content_type),
+            HTTP_HEADER_CACHE_CONTROL_DEFAULT,
+        )
+        if len(HEADER_PREFIXES) < MAX_INTERNED_HEADERS:
+            HEADER_PREFIXES[content_type] = prefix
+    return prefix
+
+
+HEADER_PREFIXES[HTTP_HEADER_CONTENT_TYPE_DEFAULT[1]] = (
+    HTTP_HEADER_CONTENT_TYPE_DEFAULT,
+    HTTP_HEADER_CACHE_CONTROL_DEFAULT,
+)
 
 
 def permanent_redirect(absolute_url):
@@ -60,9 +111,7 @@ def permanent_redirect(absolute_url):
     The HTTP response status code 301 Moved Permanently is used for
     permanent redirection.
     """
-    response = HTTPResponse()
-    response.redirect(absolute_url, 301)
-    return response
+    return redirect_response(absolute_url, 301)
 
 
 def redirect(absolute_url):
@@ -71,9 +120,7 @@ def redirect(absolute_url):
     The HTTP response status code 302 Found is a common way of
     performing a redirection.
     """
-    response = HTTPResponse()
-    response.redirect(absolute_url, 302)
-    return response
+    return redirect_response(absolute_url, 302)
 
 
 found = redirect
@@ -91,9 +138,7 @@ def see_other(absolute_url):
     The specified URI is not a substitute reference for the original
     resource.
     """
-    response = HTTPResponse()
-    response.redirect(absolute_url, 303)
-    return response
+    return redirect_response(absolute_url, 303)
 
 
 def temporary_redirect(absolute_url):
@@ -105,9 +150,7 @@ def temporary_redirect(absolute_url):
     when reissuing the original request. For instance, a POST
     request must be repeated using another POST request.
     """
-    response = HTTPResponse()
-    response.redirect(absolute_url, 307)
-    return response
+    return redirect_response(absolute_url, 307)
 
 
 def ajax_redirect(absolute_url):
@@ -131,8 +174,19 @@ def ajax_redirect(absolute_url):
             }
         });
     """
+    return redirect_response(absolute_url, 207)
+
+
+def redirect_response(absolute_url, status_code):
+    """Returns a response that redirects to ``absolute_url`` with
+    ``status_code``, the default Content-Type header is shared.
+    """
     response = HTTPResponse()
-    response.redirect(absolute_url, 207)
+    response.status_code = status_code
+    response.headers = [
+        HTTP_HEADER_CONTENT_TYPE_DEFAULT,
+        ("Location", absolute_url),
+    ]
     return response
 
 
@@ -154,10 +208,19 @@ def http_error(status_code):
     return response
 
 
-def json_response(obj, encoding="UTF-8"):
-    """Returns json response."""
+def json_response(obj, encoding="UTF-8", codec=None):
+    """Returns json response.
+
+    ``codec`` - a ``JSONCodec`` (e.g. ``options["JSON_CODEC"]``) that
+    encodes ``obj`` to UTF-8 bytes directly.
+    """
     response = HTTPResponse("application/json; charset=" + encoding, encoding)
-    response.write_bytes(json_encode(obj).encode(encoding))
+    if codec is None:
+        response.write_bytes(json_encode(obj).encode(encoding))
+    elif encoding == "UTF-8":
+        response.write_bytes(codec.dumps(obj))
+    else:
+        response.write_bytes(codec.dumps(obj).decode("UTF-8").encode(encoding))
     return response
 
 
@@ -167,11 +230,23 @@ class HTTPResponse(object):
     Response headers Content-Length and Cache-Control
     must not be set by user code directly. Use
     ``HTTPCachePolicy`` instead (``HTTPResponse.cache``).
+
+    ``headers``, ``cookies`` and ``cache_dependency`` lists are
+    created on first access.
     """
 
-    status_code = 200
-    cache_policy = None
-    cache_profile = None
+    __slots__ = (
+        "content_type",
+        "encoding",
+        "status_code",
+        "cache_policy",
+        "cache_profile",
+        "coalesce_size",
+        "buffer",
+        "_headers",
+        "_cookies",
+        "_cache_dependency",
+    )
 
     def __init__(
         self, content_type="text/html; charset=UTF-8", encoding="UTF-8"
@@ -179,10 +254,51 @@ class HTTPResponse(object):
         """Initializes HTTP response."""
         self.content_type = content_type
         self.encoding = encoding
-        self.headers = [("Content-Type", content_type)]
+        self.status_code = 200
+        self.cache_policy = self.cache_profile = None
+        # adjacent chunks smaller than this are joined into a block of
+        # about this size before passed to server, 0 disables it
+        self.coalesce_size = COALESCE_SIZE
         self.buffer = []
-        self.cookies = []
-        self.cache_dependency = []
+        self._headers = self._cookies = self._cache_dependency = None
+
+    def get_headers(self):
+        """Returns a list of response headers, Content-Type is the
+        first one.
+        """
+        headers = self._headers
+        if headers is None:
+            headers = self._headers = [header_prefix(self.content_type)[0]]
+        return headers
+
+    def set_headers(self, headers):
+        self._headers = headers
+
+    headers = property(get_headers, set_headers)
+
+    def get_cookies(self):
+        """Returns a list of cookies to set in response."""
+        cookies = self._cookies
+        if cookies is None:
+            cookies = self._cookies = []
+        return cookies
+
+    def set_cookies(self, cookies):
+        self._cookies = cookies
+
+    cookies = property(get_cookies, set_cookies)
+
+    def get_cache_dependency(self):
+        """Returns a list of cache dependency keys."""
+        cache_dependency = self._cache_dependency
+        if cache_dependency is None:
+            cache_dependency = self._cache_dependency = []
+        return cache_dependency
+
+    def set_cache_dependency(self, cache_dependency):
+        self._cache_dependency = cache_dependency
+
+    cache_dependency = property(get_cache_dependency, set_cache_dependency)
 
     def get_status(self):
         """Returns a string that describes the specified
@@ -211,20 +327,294 @@ class HTTPResponse(object):
         """
         self.buffer.append(chunk)
 
-    def __call__(self, start_response):
-        """WSGI call processing."""
-        headers = self.headers
+    def extend_headers(self):
+        """Extends response headers with cache policy and cookies."""
+        headers = self._headers
+        if headers is None and not self.cache_policy and not self._cookies:
+            # the common case: interned headers only
+            headers = self._headers = list(header_prefix(self.content_type))
+            return headers
+        headers = self.get_headers()
         append = headers.append
         cache_policy = self.cache_policy
         if cache_policy:
             cache_policy.extend(headers)
         else:
             append(HTTP_HEADER_CACHE_CONTROL_DEFAULT)
-        if self.cookies:
+        if self._cookies:
             encoding = self.encoding
-            for cookie in self.cookies:
+            for cookie in self._cookies:
                 append(cookie.http_set_cookie(encoding))
+        return headers
+
+    def __call__(self, start_response):
+        """WSGI call processing."""
         buffer = self.buffer
-        append(("Content-Length", str(sum([len(chunk) for chunk in buffer]))))
+        length = sum(map(len, buffer))
+        content_length = CONTENT_LENGTH_HEADERS.get(length)
+        if content_length is None:
+            content_length = content_length_header(length)
+        if self._headers is None and not (self.cache_policy or self._cookies):
+            # the common case: interned headers only
+            prefix = HEADER_PREFIXES.get(self.content_type)
+            if prefix is None:
+                prefix = header_prefix(self.content_type)
+            headers = self._headers = [prefix[0], prefix[1], content_length]
+        else:
+            headers = self.extend_headers()
+            headers.append(content_length)
         start_response(HTTP_STATUS[self.status_code], headers)
+        if len(buffer) > 1 and self.coalesce_size:
+            if length <= self.coalesce_size:
+                return [b"".join(buffer)]
+            return coalesce_chunks(buffer, self.coalesce_size)
         return buffer
+
+
+class HTTPErrorResponse(object):
+    """Immutable HTTP response with ``status_code`` and an empty
+    body. The headers are built once, a single instance per status
+    code is shared (see ``HTTP_ERROR_RESPONSES``), so it costs
+    nothing to respond with it. It is used internally (e.g. for
+    unmatched path or disallowed method).
+
+    Use ``http_error`` for a response that can be modified.
+    """
+
+    __slots__ = ("status_code", "status", "headers")
+
+    content_type = HTTP_HEADER_CONTENT_TYPE_DEFAULT[1]
+    encoding = "UTF-8"
+    cache_policy = None
+    cache_profile = None
+    buffer = ()
+    cookies = ()
+    cache_dependency = ()
+
+    def __init__(self, status_code):
+        """Initializes HTTP error response."""
+        init = super(HTTPErrorResponse, self).__setattr__
+        init("status_code", status_code)
+        init("status", HTTP_STATUS[status_code])
+        init(
+            "headers",
+            header_prefix(self.content_type) + (content_length_header(0),),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'HTTPErrorResponse' object is immutable")
+
+    def __call__(self, start_response):
+        """WSGI call processing."""
+        # server is allowed to modify the list of headers
+        start_response(self.status, list(self.headers))
+        return self.buffer
+
+
+HTTP_ERROR_RESPONSES = {
+    status_code: HTTPErrorResponse(status_code)
+    for status_code in HTTP_STATUS
+    if status_code >= 400
+}
+
+
+def coalesce_chunks(chunks, size):
+    """Joins adjacent ``chunks`` smaller than ``size`` into blocks
+    of about ``size``, so server writes them with fewer syscalls.
+
+    >>> coalesce_chunks([b'a', b'b', b'cde', b'f', b'g'], 3)
+    [b'ab', b'cde', b'fg']
+    """
+    result = []
+    pending = []
+    pending_length = 0
+    for chunk in chunks:
+        n = len(chunk)
+        if n >= size:
+            if pending:
+                result.append(b"".join(pending))
+                pending = []
+                pending_length = 0
+            result.append(chunk)
+            continue
+        pending.append(chunk)
+        pending_length += n
+        if pending_length >= size:
+            result.append(b"".join(pending))
+            pending = []
+            pending_length = 0
+    if pending:
+        result.append(b"".join(pending))
+    return result
+
+
+class HTTPArenaResponse(HTTPResponse):
+    """HTTP response that writes chunks into a contiguous in-memory
+    arena instead of a list of small bytes objects, so a page made of
+    many fragments is handed to server as a single block.
+
+    The arena content is moved to ``buffer`` (as one bytes object,
+    without a copy) on first access, transforms and caching see a
+    regular list buffer.
+    """
+
+    __slots__ = ("arena", "write_bytes", "chunks")
+
+    def __init__(
+        self, content_type="text/html; charset=UTF-8", encoding="UTF-8"
+    ):
+        """Initializes HTTP response."""
+        self.arena = BytesIO()
+        # appends chunk to the arena
+        self.write_bytes = self.arena.write
+        super(HTTPArenaResponse, self).__init__(content_type, encoding)
+
+    def get_buffer(self):
+        """Returns response buffer, the arena content is appended as
+        a single chunk.
+        """
+        arena = self.arena
+        if arena.tell():
+            self.chunks.append(arena.getvalue())
+            arena.seek(0)
+            arena.truncate()
+        return self.chunks
+
+    def set_buffer(self, chunks):
+        """Replaces response buffer, the arena content is discarded."""
+        self.arena.seek(0)
+        self.arena.truncate()
+        self.chunks = chunks
+
+    buffer = property(get_buffer, set_buffer)
+
+    def write(self, chunk):
+        """Applies encoding to ``chunk`` and append it to the arena."""
+        self.write_bytes(chunk.encode(self.encoding))
+
+
+class HTTPStreamingResponse(HTTPResponse):
+    """HTTP streaming response, the body is an iterable (e.g. a
+    generator) of chunks that is sent as it is produced.
+
+    Cache policy and cookies are applied the same way as for
+    ``HTTPResponse``, Content-Length is omitted, so the server
+    either uses chunked transfer encoding or closes connection.
+    """
+
+    __slots__ = ()
+
+    def __init__(
+        self,
+        iterable,
+        content_type="text/html; charset=UTF-8",
+        encoding="UTF-8",
+    ):
+        """
+        ``iterable`` - chunks of str (encoded with ``encoding``) or
+        bytes.
+        """
+        super(HTTPStreamingResponse, self).__init__(content_type, encoding)
+        self.buffer = encode_chunks(iterable, encoding)
+
+    def __call__(self, start_response):
+        """WSGI call processing."""
+        start_response(HTTP_STATUS[self.status_code], self.extend_headers())
+        return self.buffer
+
+
+def encode_chunks(chunks, encoding):
+    """Encodes str ``chunks`` with ``encoding``, bytes are passed
+    as is.
+    """
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(encoding)
+            yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class HTTPFileResponse(HTTPResponse):
+    """HTTP response with the content of a file. The file is returned
+    with ``wsgi.file_wrapper`` if server supports it, so it can use
+    platform specific means (e.g. sendfile), otherwise it is read by
+    blocks.
+
+    Content-Length is taken from file metadata (``stat``), the
+    response ``buffer`` is always empty.
+    """
+
+    __slots__ = (
+        "path",
+        "file",
+        "stat",
+        "content_length",
+        "file_wrapper",
+        "block_size",
+    )
+
+    def __init__(
+        self,
+        f,
+        content_type=None,
+        file_wrapper=None,
+        block_size=65536,
+        encoding="UTF-8",
+    ):
+        """
+        ``f`` - a path or a file object open in binary mode; the
+        file is closed once the response is sent.
+        ``content_type`` - defaults to a type guessed by the file name.
+        ``file_wrapper`` - ``wsgi.file_wrapper`` from request environ.
+        """
+        if isinstance(f, (str, os.PathLike)):
+            if content_type is None:
+                content_type = guess_type(os.fspath(f))[0]
+            self.path = f
+            self.file = None
+            self.stat = os.stat(f)
+            self.content_length = self.stat.st_size
+        else:
+            self.path = None
+            self.file = f
+            self.stat = os.fstat(f.fileno())
+            self.content_length = self.stat.st_size - f.tell()
+        super(HTTPFileResponse, self).__init__(
+            content_type or "application/octet-stream", encoding
+        )
+        self.buffer = ()
+        self.file_wrapper = file_wrapper
+        self.block_size = block_size
+
+    def __call__(self, start_response):
+        """WSGI call processing."""
+        headers = self.extend_headers()
+        headers.append(content_length_header(self.content_length))
+        start_response(HTTP_STATUS[self.status_code], headers)
+        f = self.file
+        if f is None:
+            f = open(self.path, "rb")
+        if self.file_wrapper is not None:
+            return self.file_wrapper(f, self.block_size)
+        return read_blocks(f, self.block_size)
+
+
+def read_blocks(f, block_size, length=-1):
+    """Reads file ``f`` by blocks of ``block_size``, up to
+    ``length`` bytes if it is not negative.
+    """
+    try:
+        while length:
+            if 0 < length < block_size:
+                block_size = length
+            block = f.read(block_size)
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        f.close()
@@ -0,0 +1,58 @@
+"""Benchmark ETag builders on realistic body sizes.
+
+Run with ``python -m pytest src/wheezy/http/tests/benchmark_cache.py``.
+"""
+
+import unittest
+
+from wheezy.core.benchmark import Benchmark
+
+from wheezy.http.cache import (
+    etag_adler32,
+    etag_blake2b,
+    etag_crc32,
+    etag_md5,
+    etag_md5crc32,
+)
+
+KB = 1024
+
+
+def make_body(size, chunk_size=8 * KB):
+    chunk = bytes(range(256)) * (chunk_size // 256)
+    return [chunk] * (size // chunk_size)
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    """"""
+
+    def runTest(self):  # noqa: N802
+        """Perform benchmark and print results."""
+        for size, number in (
+            (64 * KB, 2000),
+            (1024 * KB, 200),
+            (8192 * KB, 20),
+        ):
+            buf = make_body(size)
+            p = Benchmark(
+                [
+                    target(name, f, buf)
+                    for name, f in (
+                        ("etag_md5", etag_md5),
+                        ("etag_md5crc32", etag_md5crc32),
+                        ("etag_blake2b", etag_blake2b),
+                        ("etag_crc32", etag_crc32),
+                        ("etag_adler32", etag_adler32),
+                    )
+                ],
+                number,
+            )
+            p.report("etag %dK" % (size // KB))
+
+
+def target(name, f, buf):
+    def t():
+        f(buf)
+
+    t.__name__ = name
+    return t
@@ -0,0 +1,70 @@
+"""Benchmark JSON codecs on large payloads, including the str round
+trip of the default path.
+
+Run with ``python -m pytest -s src/wheezy/http/tests/benchmark_jsoncodec.py``.
+"""
+
+import unittest
+from json import loads as json_loads
+
+from wheezy.core.benchmark import Benchmark
+from wheezy.core.json import json_encode
+
+from wheezy.http.jsoncodec import json_codec, orjson_codec
+
+KB = 1024
+
+
+def make_payload(count):
+    return [
+        {
+            "id": i,
+            "name": "item %d" % i,
+            "tags": ["a", "b", "c"],
+            "price": i * 1.5,
+            "active": i % 2 == 0,
+        }
+        for i in range(count)
+    ]
+
+
+def encode_str(obj):
+    return json_encode(obj).encode("UTF-8")
+
+
+def decode_str(data):
+    return json_loads(data.decode("UTF-8"))
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    """"""
+
+    def runTest(self):  # noqa: N802
+        """Perform benchmark and print results."""
+        codecs = [("json_codec", json_codec.dumps, json_codec.loads)]
+        if orjson_codec is not None:
+            codecs.append(
+                ("orjson_codec", orjson_codec.dumps, orjson_codec.loads)
+            )
+        for count, number in ((1000, 200), (10000, 20), (100000, 2)):
+            obj = make_payload(count)
+            data = json_codec.dumps(obj)
+            size = len(data) // KB
+            Benchmark(
+                [target("str round trip", encode_str, obj)]
+                + [target(name, dumps, obj) for name, dumps, loads in codecs],
+                number,
+            ).report("dumps %dK" % size)
+            Benchmark(
+                [target("str round trip", decode_str, data)]
+                + [target(name, loads, data) for name, dumps, loads in codecs],
+                number,
+            ).report("loads %dK" % size)
+
+
+def target(name, f, arg):
+    def t():
+        f(arg)
+
+    t.__name__ = name
+    return t
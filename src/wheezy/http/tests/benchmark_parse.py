@@ -0,0 +1,96 @@
+"""Benchmark query string and cookie parsing.
+
+Run with ``python -m pytest -s src/wheezy/http/tests/benchmark_parse.py``.
+"""
+
+import unittest
+
+from wheezy.core.benchmark import Benchmark
+
+from wheezy.http.parse import (
+    LazyQuery,
+    cookie_cache,
+    parse_cookie,
+    parse_qs,
+    query_cache,
+)
+from wheezy.http.tests.test_parse import parse_qs_reference
+
+SHORT_QS = "page=2&size=20"
+LONG_QS = "&".join(
+    [SHORT_QS]
+    + ["utm_%d=campaign%%20%d%%2Fsource+%d" % (i, i, i) for i in range(50)]
+    + ["fbclid=IwAR" + "x" * 100, "tags=a,b,c,d"]
+)
+PERCENT_QS = "&".join(
+    "q%%20%d=%%E2%%82%%AC%%20%d,%%C3%%A9" % (i, i) for i in range(50)
+)
+
+
+class ParseQSBenchmarkTestCase(unittest.TestCase):
+    """"""
+
+    def runTest(self):  # noqa: N802
+        """Perform benchmark and print results."""
+        for name, qs in (
+            ("short", SHORT_QS),
+            ("long", LONG_QS),
+            ("percent-heavy", PERCENT_QS),
+        ):
+            Benchmark(
+                [
+                    target("reference", lambda qs=qs: parse_qs_reference(qs)),
+                    target("parse_qs", lambda qs=qs: parse_qs(qs)),
+                ],
+                20000,
+            ).report("parse %s query" % name)
+
+
+class LazyQueryBenchmarkTestCase(unittest.TestCase):
+    """"""
+
+    def runTest(self):  # noqa: N802
+        """Perform benchmark and print results."""
+        for name, qs in (("short", SHORT_QS), ("long", LONG_QS)):
+            Benchmark(
+                [
+                    target("parse_qs", lambda qs=qs: parse_qs(qs).get("page")),
+                    target("lazy", lambda qs=qs: LazyQuery(qs).get("page")),
+                ],
+                20000,
+            ).report("get one param of %s query" % name)
+
+
+COOKIE = (
+    "_ga=GA1.2.1234567890.1234567890; _gid=GA1.2.987654321.987654321; "
+    "consent=necessary%2Cpreferences%2Cstatistics; lang=en; "
+    "session=0123456789abcdef0123456789abcdef"
+)
+
+
+class ParseCacheBenchmarkTestCase(unittest.TestCase):
+    """"""
+
+    def runTest(self):  # noqa: N802
+        """Perform benchmark and print results."""
+        cache = query_cache()
+        Benchmark(
+            [
+                target("parse_qs", lambda: parse_qs(LONG_QS)),
+                target("query_cache", lambda: cache(LONG_QS)),
+            ],
+            20000,
+        ).report("repeated long query")
+        cache = cookie_cache()
+        Benchmark(
+            [
+                target("parse_cookie", lambda: parse_cookie(COOKIE)),
+                target("cookie_cache", lambda: cache(COOKIE)),
+            ],
+            20000,
+        ).report("repeated cookie")
+
+
+def target(name, f):
+    f.__name__ = name
+    return f
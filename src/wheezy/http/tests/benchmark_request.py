@@ -0,0 +1,60 @@
+"""Benchmark http request construction, attribute access and memory
+allocated per request.
+
+Run with ``python -m pytest -s src/wheezy/http/tests/benchmark_request.py``.
+"""
+
+import tracemalloc
+import unittest
+
+from wheezy.core.benchmark import Benchmark
+
+from wheezy.http.request import HTTPRequest
+
+ENVIRON = {
+    "REQUEST_METHOD": "GET",
+    "SCRIPT_NAME": "",
+    "PATH_INFO": "/welcome",
+    "QUERY_STRING": "page=2&size=20",
+    "HTTP_HOST": "python.org",
+    "HTTP_COOKIE": "ID=1234; PREF=abc",
+    "wsgi.url_scheme": "https",
+}
+OPTIONS = {"MAX_CONTENT_LENGTH": 1024}
+
+
+def construct():
+    return HTTPRequest(ENVIRON, "UTF-8", OPTIONS)
+
+
+def handle():
+    request = HTTPRequest(ENVIRON, "UTF-8", OPTIONS)
+    request.path
+    request.get_param("page")
+    request.cookies
+    request.secure
+    request.path
+    return request
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    """"""
+
+    def runTest(self):  # noqa: N802
+        """Perform benchmark and print results."""
+        Benchmark((construct, handle), 200000).report("http request")
+
+
+class MemoryTestCase(unittest.TestCase):
+    """"""
+
+    def runTest(self):  # noqa: N802
+        """Print memory allocated per request."""
+        n = 1000
+        for name, f in (("construct", construct), ("handle", handle)):
+            tracemalloc.start()
+            requests = [f() for i in range(n)]
+            size, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print("%s: %d bytes per request" % (name, size // n))
+            del requests
@@ -0,0 +1,167 @@
+"""Benchmark response buffer backends and chunk coalescing on pages
+made of many small fragments, each chunk returned to server costs a
+write syscall.
+
+Run with ``python -m pytest -s src/wheezy/http/tests/benchmark_response.py``.
+"""
+
+import os
+import tracemalloc
+import unittest
+from io import BytesIO
+from wsgiref.handlers import SimpleHandler
+from wsgiref.util import setup_testing_defaults
+
+from wheezy.core.benchmark import Benchmark
+
+from wheezy.http.response import HTTPArenaResponse, HTTPResponse
+
+
+def start_response(status, headers):
+    return None
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    """"""
+
+    def setUp(self):
+        self.fd = os.open(os.devnull, os.O_WRONLY)
+
+    def tearDown(self):
+        os.close(self.fd)
+
+    def runTest(self):  # noqa: N802
+        """Perform benchmark and print results."""
+        for count, number in ((100, 5000), (1000, 500), (10000, 50)):
+            fragments = ["<td>%d</td>" % i for i in range(count)]
+            p = Benchmark(
+                [
+                    target(name, response_class, fragments, self.fd)
+                    for name, response_class in (
+                        ("list", HTTPResponse),
+                        ("arena", HTTPArenaResponse),
+                    )
+                ],
+                number,
+            )
+            p.report("write %d fragments" % count)
+
+
+class MemoryTestCase(unittest.TestCase):
+    """"""
+
+    def runTest(self):  # noqa: N802
+        """Print memory blocks and bytes allocated per response."""
+        n = 1000
+        for name, f in (
+            ("construct", lambda: HTTPResponse()),
+            ("respond", respond),
+        ):
+            tracemalloc.start()
+            responses = [f() for i in range(n)]
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            stats = snapshot.statistics("filename")
+            print(
+                "%s: %d blocks, %d bytes per response"
+                % (
+                    name,
+                    sum(stat.count for stat in stats) // n,
+                    sum(stat.size for stat in stats) // n,
+                )
+            )
+            del responses
+
+
+def respond():
+    r = HTTPResponse()
+    r.write_bytes(b"Hello")
+    r(start_response)
+    return r
+
+
+def target(name, response_class, fragments, fd):
+    def t():
+        r = response_class()
+        write = r.write
+        for fragment in fragments:
+            write(fragment)
+        for chunk in r(start_response):
+            os.write(fd, chunk)
+
+    t.__name__ = name
+    return t
+
+
+class WSGIRefBenchmarkTestCase(unittest.TestCase):
+    """"""
+
+    def setUp(self):
+        self.stdout = CountingWriter(os.open(os.devnull, os.O_WRONLY))
+
+    def tearDown(self):
+        os.close(self.stdout.fd)
+
+    def runTest(self):  # noqa: N802
+        """Perform benchmark and print results with the number of
+        writes per request.
+        """
+        environ = {}
+        setup_testing_defaults(environ)
+        for count, number in ((100, 2000), (1000, 200), (10000, 20)):
+            fragments = ["<td>%d</td>" % i for i in range(count)]
+            targets = []
+            writes = []
+            for name, coalesce_size in (
+                ("as is", 0),
+                ("coalesce 4K", 4096),
+                ("coalesce 16K", 16384),
+            ):
+                app = make_app(fragments, coalesce_size)
+                self.stdout.writes = 0
+                serve(app, environ, self.stdout)
+                writes.append("%s: %d" % (name, self.stdout.writes))
+                targets.append(wsgiref_target(name, app, environ, self.stdout))
+            Benchmark(targets, number).report(
+                "wsgiref %d fragments (writes %s)" % (count, ", ".join(writes))
+            )
+
+
+class CountingWriter(object):
+    """Writes to a file descriptor and counts write calls."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return os.write(self.fd, data)
+
+    def flush(self):
+        pass
+
+
+def make_app(fragments, coalesce_size):
+    def app(environ, start_response):
+        r = HTTPResponse()
+        r.coalesce_size = coalesce_size
+        write = r.write
+        for fragment in fragments:
+            write(fragment)
+        return r(start_response)
+
+    return app
+
+
+def serve(app, environ, stdout):
+    handler = SimpleHandler(BytesIO(), stdout, BytesIO(), environ.copy())
+    handler.run(app)
+
+
+def wsgiref_target(name, app, environ, stdout):
+    def t():
+        serve(app, environ, stdout)
+
+    t.__name__ = name
+    return t
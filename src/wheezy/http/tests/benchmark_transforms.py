@@ -0,0 +1,59 @@
+"""Benchmark compression transforms on large response bodies.
+
+Run with ``python -m pytest -s src/wheezy/http/tests/benchmark_transforms.py``.
+"""
+
+import unittest
+from unittest.mock import Mock
+
+from wheezy.core.benchmark import Benchmark
+
+from wheezy.http.transforms import gzip_parallel_transform, gzip_transform
+
+
+def make_body(count):
+    return [
+        b"".join(
+            [
+                b'{"id":%d,"name":"item %d","price":%d.%02d},' % (i, i, i, i)
+                for i in range(count)
+            ]
+        )
+    ]
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    """"""
+
+    def runTest(self):  # noqa: N802
+        """Perform benchmark and print results."""
+        request = Mock()
+        request.environ = {"HTTP_ACCEPT_ENCODING": "gzip"}
+        for count, number in ((20000, 20), (200000, 5)):
+            buf = make_body(count)
+            p = Benchmark(
+                [
+                    target("gzip_transform", gzip_transform(), request, buf),
+                    target(
+                        "gzip_parallel_transform",
+                        gzip_parallel_transform(parallel_length=0),
+                        request,
+                        buf,
+                    ),
+                ],
+                number,
+            )
+            p.report("gzip %dK" % (len(buf[0]) // 1024))
+
+
+def target(name, transform, request, buf):
+    response = Mock()
+    response.content_type = "application/json"
+    response.cache_policy = None
+
+    def t():
+        response.buffer = buf
+        transform(request, response)
+
+    t.__name__ = name
+    return t
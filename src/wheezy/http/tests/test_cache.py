@@ -1,22 +1,42 @@
+import os
+import shutil
+import tempfile
 import unittest
 from datetime import datetime
 from hashlib import md5
+from os import stat_result
 from unittest.mock import Mock
+from zlib import adler32, crc32
 
 from wheezy.http.cache import (
     CacheableResponse,
     NotModifiedResponse,
+    PartialContentResponse,
+    RangeNotSatisfiableResponse,
     SurfaceResponse,
+    etag_adler32,
+    etag_blake2b,
+    etag_crc32,
     etag_md5,
     etag_md5crc32,
+    etag_stat,
     make_etag,
+    make_etag_checksum,
     make_etag_crc32,
+    range_response,
     response_cache,
+    slice_chunks,
     wsgi_cache,
 )
 from wheezy.http.cachepolicy import HTTPCachePolicy
 from wheezy.http.cacheprofile import CacheProfile
-from wheezy.http.response import HTTPResponse
+
+from wheezy.http.response import (  # isort:skip
+    HTTPFileResponse,
+    HTTPResponse,
+    HTTPStreamingResponse,
+    HTTP_ERROR_RESPONSES,
+)
 
 
 class ResponseCacheDecoratorTestCase(unittest.TestCase):
@@ -144,6 +164,72 @@ class ResponseCacheDecoratorTestCase(unittest.TestCase):
         assert mock_response.cache_profile is None
         assert policy == mock_response.cache_policy
 
+    def test_error_response(self):
+        """Shared immutable error response is replaced by a mutable
+        one for each strategy.
+        """
+        for profile in (
+            None,
+            CacheProfile("none"),
+            CacheProfile("server", duration=100),
+            CacheProfile("both", duration=100, etag_func=etag_md5crc32),
+        ):
+            handler = response_cache(profile)(
+                lambda request: HTTP_ERROR_RESPONSES[404]
+            )
+
+            response = handler("request")
+
+            assert isinstance(response, HTTPResponse)
+            assert 404 == response.status_code
+            assert response.cache_policy
+            if profile and profile.request_vary:
+                assert profile == response.cache_profile
+            else:
+                assert response.cache_profile is None
+
+    def test_streaming_response_etag(self):
+        """ETag is not computed for streaming response, so the body
+        is not consumed.
+        """
+        profile = CacheProfile("both", duration=100, etag_func=etag_md5crc32)
+        handler = response_cache(profile)(
+            lambda request: HTTPStreamingResponse(iter(["a", "b"]))
+        )
+
+        response = handler("request")
+
+        assert response.cache_policy.http_etag is None
+        assert [b"a", b"b"] == list(response(Mock()))
+
+    def test_file_response_etag(self):
+        """ETag of file response is built from file metadata, so
+        different files have different ETags.
+        """
+        profile = CacheProfile("both", duration=100, etag_func=etag_md5crc32)
+        handler = response_cache(profile)(
+            lambda request: HTTPFileResponse(request)
+        )
+        d = tempfile.mkdtemp()
+        try:
+            etags = []
+            for name, content in (("a.txt", b"a"), ("b.txt", b"bb")):
+                path = os.path.join(d, name)
+                with open(path, "wb") as f:
+                    f.write(content)
+
+                response = handler(path)
+
+                etag = response.cache_policy.http_etag
+                assert etag_stat(os.stat(path)) == etag
+                etags.append(etag)
+                with open(path, "rb") as f:
+                    response = handler(f)
+                assert etag == response.cache_policy.http_etag
+        finally:
+            shutil.rmtree(d)
+        assert etags[0] != etags[1]
+
 
 class WSGICacheDecoratorTestCase(unittest.TestCase):
     """Test the ``wsgi_cache`` decorator."""
@@ -188,6 +274,30 @@ class ETagTestCase(unittest.TestCase):
         buf = [b"test"] * 10
         assert '"a57e3ecb"' == etag(buf) == etag_md5crc32(buf)
 
+    def test_etag_blake2b(self):
+        """Ensure valid ETag from blake2b with a short digest."""
+        buf = [b"test"] * 10
+        etag = etag_blake2b(buf)
+
+        assert 18 == len(etag)
+        assert etag == etag_blake2b([b"test" * 10])
+        assert etag != etag_blake2b([b"test"] * 9)
+
+    def test_make_etag_checksum(self):
+        """Ensure running checksum is independent of chunking."""
+        buf = [b"test"] * 10
+        for checksum, etag in ((crc32, etag_crc32), (adler32, etag_adler32)):
+            expected = '"%08x"' % checksum(b"test" * 10)
+
+            assert expected == etag(buf) == etag([b"test" * 10])
+            assert expected == make_etag_checksum(checksum)(buf)
+
+    def test_etag_stat(self):
+        """Ensure weak ETag from file size and modification time."""
+        st = stat_result((0, 0, 0, 0, 0, 0, 4096, 0, 1500000000.75, 0))
+
+        assert 'W/"59682f00-1000"' == etag_stat(st)
+
 
 class SurfaceResponseTestCase(unittest.TestCase):
     """Test the ``SurfaceResponse``."""
@@ -262,7 +372,7 @@ class CacheableResponseTestCase(unittest.TestCase):
         assert cacheable_response.last_modified is None
         assert cacheable_response.etag is None
         assert self.response.headers == cacheable_response.headers
-        assert tuple(self.response.buffer) == cacheable_response.buffer
+        assert (b"test-1test-2",) == cacheable_response.buffer
 
     def test_init_cache_policy(self):
         """Ensure HTTP cache policy values last_modified and etag
@@ -287,7 +397,7 @@ class CacheableResponseTestCase(unittest.TestCase):
 
         result = cacheable_response(mock_start_response)
 
-        assert (b"test-1", b"test-2") == result
+        assert (b"test-1test-2",) == result
         status, headers = mock_start_response.call_args[0]
         assert "200 OK" == status
         assert 3 == len(headers)
@@ -305,3 +415,103 @@ class CacheableResponseTestCase(unittest.TestCase):
         status, headers = mock_start_response.call_args[0]
         assert "200 OK" == status
         assert not [n for n, v in headers if n == "Set-Cookie"]
+
+
+class RangeResponseTestCase(unittest.TestCase):
+    """Test the ``range_response``."""
+
+    def setUp(self):
+        self.chunks = (b"abc", b"de", b"fgh")
+        self.headers = [
+            ("Content-Type", "text/plain"),
+            ("Content-Length", "8"),
+            ("ETag", '"x"'),
+            ("Last-Modified", "Tue, 17 Apr 2012 09:58:27 GMT"),
+        ]
+
+    def range_response(self, environ):
+        return range_response(
+            environ,
+            self.headers,
+            8,
+            lambda start, end: slice_chunks(self.chunks, start, end),
+        )
+
+    def start(self, response):
+        mock_start_response = Mock()
+        body = b"".join(response(mock_start_response))
+        status, headers = mock_start_response.call_args[0]
+        return body, status, dict(headers)
+
+    def test_slice_chunks(self):
+        """Chunks in range are not copied."""
+        for start, end, e in (
+            (0, 8, list(self.chunks)),
+            (0, 1, [b"a"]),
+            (3, 5, [b"de"]),
+            (4, 8, [b"e", b"fgh"]),
+            (7, 20, [b"h"]),
+        ):
+            assert e == slice_chunks(self.chunks, start, end)
+        assert self.chunks[1] is slice_chunks(self.chunks, 3, 5)[0]
+
+    def test_ignored(self):
+        """Full response is sent for no, malformed or mismatched
+        If-Range request."""
+        for environ in (
+            {},
+            {"HTTP_RANGE": "bytes=x"},
+            {"HTTP_RANGE": "bytes=0-1", "HTTP_IF_RANGE": '"y"'},
+            {"HTTP_RANGE": "bytes=0-1", "HTTP_IF_RANGE": 'W/"x"'},
+            {"HTTP_RANGE": "bytes=0-1", "HTTP_IF_RANGE": "Tue"},
+        ):
+            assert self.range_response(environ) is None
+
+    def test_single(self):
+        """A single range has Content-Range header."""
+        for if_range in ('"x"', "Tue, 17 Apr 2012 09:58:27 GMT"):
+            response = self.range_response(
+                {"HTTP_RANGE": "bytes=2-4", "HTTP_IF_RANGE": if_range}
+            )
+
+            assert isinstance(response, PartialContentResponse)
+            assert 206 == response.status_code
+            body, status, headers = self.start(response)
+            assert b"cde" == body
+            assert "206 Partial Content" == status
+            assert "bytes 2-4/8" == headers["Content-Range"]
+            assert "3" == headers["Content-Length"]
+            assert "text/plain" == headers["Content-Type"]
+
+    def test_multipart(self):
+        """Several ranges are sent as multipart/byteranges."""
+        response = self.range_response({"HTTP_RANGE": "bytes=0-1,-2"})
+
+        body, status, headers = self.start(response)
+        content_type, boundary = headers["Content-Type"].split("; boundary=")
+        assert "multipart/byteranges" == content_type
+        assert "Content-Range" not in headers
+        assert str(len(body)) == headers["Content-Length"]
+        boundary = boundary.encode("latin1")
+        assert (
+            b"--"
+            + boundary
+            + b"\r\nContent-Type: text/plain\r\n"
+            + b"Content-Range: bytes 0-1/8\r\n\r\nab\r\n--"
+            + boundary
+            + b"\r\nContent-Type: text/plain\r\n"
+            + b"Content-Range: bytes 6-7/8\r\n\r\ngh\r\n--"
+            + boundary
+            + b"--\r\n"
+        ) == body
+
+    def test_not_satisfiable(self):
+        """No satisfiable ranges."""
+        response = self.range_response({"HTTP_RANGE": "bytes=8-"})
+
+        assert isinstance(response, RangeNotSatisfiableResponse)
+        body, status, headers = self.start(response)
+        assert b"" == body
+        assert "416 Requested Range Not Satisfiable" == status
+        assert "bytes */8" == headers["Content-Range"]
+        assert "0" == headers["Content-Length"]
@@ -3,7 +3,11 @@ from datetime import datetime
 
 from wheezy.core.datetime import UTC
 
-from wheezy.http.cachepolicy import HTTPCachePolicy, SUPPORTED  # isort:skip
+from wheezy.http.cachepolicy import (  # isort:skip
+    FrozenHTTPCachePolicy,
+    HTTPCachePolicy,
+    SUPPORTED,
+)
 
 
 class SupportedCacheabilityTestCase(unittest.TestCase):
@@ -320,3 +324,141 @@ class HTTPCachePolicyExtendHeadersTestCase(unittest.TestCase):
             self.assertRaises(
                 AssertionError, lambda policy=policy: policy.vary()
             )
+
+
+class CopyHTTPCachePolicyTestCase(unittest.TestCase):
+    """Test the ``HTTPCachePolicy.copy``."""
+
+    def setUp(self):
+        self.policy = HTTPCachePolicy("public")
+        self.policy.max_age(100)
+        self.policy.vary("Accept-Encoding")
+
+    def test_shared_headers(self):
+        """Headers are the same as of the original policy, rendered
+        once.
+        """
+        expected = []
+        self.policy.extend(expected)
+
+        copy = self.policy.copy()
+
+        assert copy.rendered is self.policy.rendered
+        assert copy.rendered is self.policy.copy().rendered
+        headers = []
+        copy.extend(headers)
+        assert expected == headers
+
+    def test_time_fields(self):
+        """Time dependent fields and ETag are set per copy."""
+        copy = self.policy.copy()
+        copy.last_modified(datetime(2012, 4, 13, 15, 2, tzinfo=UTC))
+        copy.expires(datetime(2012, 4, 13, 15, 3, tzinfo=UTC))
+        copy.etag('"abc"')
+
+        assert copy.rendered is not None
+        headers = []
+        copy.extend(headers)
+        assert [
+            ("Cache-Control", "public, max-age=100"),
+            ("Expires", "Fri, 13 Apr 2012 15:03:00 GMT"),
+            ("Last-Modified", "Fri, 13 Apr 2012 15:02:00 GMT"),
+            ("ETag", '"abc"'),
+            ("Vary", "Accept-Encoding"),
+        ] == headers
+        assert self.policy.http_etag is None
+
+    def test_copy_on_write(self):
+        """Changes to a copy are not reflected in the original policy
+        and other copies.
+        """
+        expected = []
+        self.policy.extend(expected)
+        copy = self.policy.copy()
+        other = self.policy.copy()
+
+        copy.vary("Cookie")
+        copy.no_cache("Set-Cookie")
+        copy.append_extension("x")
+        copy.no_store()
+
+        assert copy.rendered is None
+        headers = []
+        copy.extend(headers)
+        assert [
+            (
+                "Cache-Control",
+                'public, no-cache="Set-Cookie", no-store, x, max-age=100',
+            ),
+            ("Vary", "Accept-Encoding, Cookie"),
+        ] == headers
+        for policy in (self.policy, other):
+            headers = []
+            policy.extend(headers)
+            assert expected == headers
+
+    def test_original_changed(self):
+        """Changes to the original policy are not reflected in copy."""
+        copy = self.policy.copy()
+
+        self.policy.vary("Cookie")
+        self.policy.private("Set-Cookie")
+
+        assert ("Accept-Encoding",) == copy.vary_headers
+        assert () == copy.private_fields
+        assert ["Accept-Encoding", "Cookie"] == self.policy.vary_headers
+
+
+class FrozenHTTPCachePolicyTestCase(unittest.TestCase):
+    """Test the ``FrozenHTTPCachePolicy``."""
+
+    def setUp(self):
+        self.policy = HTTPCachePolicy("public")
+        self.policy.max_age(100)
+        self.policy.last_modified(datetime(2012, 4, 13, 15, 2, tzinfo=UTC))
+        self.policy.etag('"abc"')
+        self.policy.vary("Accept-Encoding")
+
+    def test_freeze(self):
+        """Headers are the same as of mutable policy."""
+        frozen = self.policy.freeze()
+
+        assert isinstance(frozen, FrozenHTTPCachePolicy)
+        assert frozen is frozen.freeze()
+        expected = []
+        self.policy.extend(expected)
+        headers = []
+        frozen.extend(headers)
+        assert expected == headers
+        assert self.policy.http_cache_control() == frozen.http_cache_control()
+        assert self.policy.http_vary() == frozen.http_vary()
+        assert frozen.is_public
+        assert '"abc"' == frozen.http_etag
+        assert self.policy.modified == frozen.modified
+
+    def test_detached(self):
+        """Changes to the original policy are not reflected."""
+        frozen = self.policy.freeze()
+        self.policy.vary("Cookie")
+        self.policy.no_store()
+
+        assert ("Accept-Encoding",) == frozen.vary_headers
+        assert not frozen.is_no_store
+        assert ("Vary", "Accept-Encoding") == frozen.headers[-1]
+
+    def test_immutable(self):
+        """Raises AssertionError on any attempt to modify."""
+        frozen = self.policy.freeze()
+        for name in (
+            "private",
+            "no_cache",
+            "no_store",
+            "must_revalidate",
+            "proxy_revalidate",
+            "no_transform",
+            "vary",
+        ):
+            self.assertRaises(AssertionError, getattr(frozen, name))
+        for name in ("append_extension", "max_age", "smax_age", "etag"):
+            self.assertRaises(AssertionError, getattr(frozen, name), "x")
+        self.assertRaises(AttributeError, setattr, frozen, "x", 1)
@@ -4,6 +4,8 @@ from unittest.mock import Mock, patch
 
 from wheezy.core.datetime import parse_http_datetime
 
+from wheezy.http.cachepolicy import FrozenHTTPCachePolicy
+
 from wheezy.http.cacheprofile import (  # isort:skip
     CACHEABILITY,
     CacheProfile,
@@ -69,6 +71,8 @@ class CacheProfileTestCase(unittest.TestCase):
 
         assert profile.request_vary
         policy = profile.cache_policy()
+        assert policy is profile.cache_policy()
+        assert isinstance(policy, FrozenHTTPCachePolicy)
         headers = []
         policy.extend(headers)
         assert [
@@ -165,6 +169,26 @@ class CacheProfileTestCase(unittest.TestCase):
             ("Last-Modified", policy.http_last_modified),
         ] == headers
 
+    def test_client_policy_shared(self):
+        """Client policy headers are rendered once per profile, a
+        change made by handler is not reflected in other responses.
+        """
+        for location in ["client", "both", "public"]:
+            profile = CacheProfile(
+                location, duration=100, http_vary=["Cookie"]
+            )
+            policy = profile.cache_policy()
+            other = profile.cache_policy()
+
+            assert policy is not other
+            assert policy.rendered is other.rendered
+            policy.vary("Accept-Encoding")
+            policy.etag('"abc"')
+            headers = []
+            profile.cache_policy().extend(headers)
+            assert ("Vary", "Cookie") == headers[-1]
+            assert "ETag" not in dict(headers)
+
     def test_no_store(self):
         """no_store."""
         for location in ["none", "server"]:
@@ -13,12 +13,15 @@ class BootstrapHTTPDefaultsTestCase(unittest.TestCase):
         assert bootstrap_http_defaults(options) is None
 
         required_options = tuple(sorted(options.keys()))
-        assert 6 == len(required_options)
+        assert 9 == len(required_options)
         assert (
             "ENCODING",
+            "HTTP_COOKIE_CACHE",
             "HTTP_COOKIE_DOMAIN",
             "HTTP_COOKIE_HTTPONLY",
             "HTTP_COOKIE_SAMESITE",
             "HTTP_COOKIE_SECURE",
+            "HTTP_QUERY_CACHE",
+            "JSON_CODEC",
             "MAX_CONTENT_LENGTH",
         ) == required_options
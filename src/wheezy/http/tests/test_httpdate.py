@@ -0,0 +1,54 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from wheezy.core import datetime as core
+
+from wheezy.http.httpdate import (
+    format_http_datetime,
+    format_http_timestamp,
+    parse_http_datetime,
+    utc_fromtimestamp,
+)
+
+UTC = timezone.utc
+
+
+class FormatHTTPDatetimeTestCase(unittest.TestCase):
+    """Test the ``format_http_datetime``."""
+
+    def test_same_as_core(self):
+        """Ensure the result is the same as of wheezy.core."""
+        when = datetime(2012, 2, 29, 23, 59, 59, 999, tzinfo=UTC)
+        for _ in range(100):
+            when += timedelta(days=7, hours=5, seconds=11)
+            naive = when.replace(tzinfo=None)
+            assert core.format_http_datetime(when) == format_http_datetime(
+                when
+            )
+            assert core.format_http_datetime(naive) == format_http_datetime(
+                naive
+            )
+
+    def test_type_error(self):
+        """Raises TypeError for unsupported type."""
+        self.assertRaises(TypeError, lambda: format_http_datetime(100))
+
+    def test_memoized(self):
+        """Ensure the same timestamp is formatted once."""
+        assert format_http_timestamp(1316429130) is format_http_timestamp(
+            1316429130
+        )
+        assert utc_fromtimestamp(1316429130) is utc_fromtimestamp(1316429130)
+
+
+class ParseHTTPDatetimeTestCase(unittest.TestCase):
+    """Test the ``parse_http_datetime``."""
+
+    def test_parse(self):
+        """Ensure parses and memoizes result."""
+        s = "Tue, 17 Apr 2012 09:58:27 GMT"
+        d = parse_http_datetime(s)
+
+        assert datetime(2012, 4, 17, 9, 58, 27) == d
+        assert d is parse_http_datetime(s)
+        assert parse_http_datetime("x") is None
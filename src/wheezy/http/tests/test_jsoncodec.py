@@ -0,0 +1,53 @@
+import unittest
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from wheezy.http.jsoncodec import (
+    fast_json_codec,
+    json_codec,
+    orjson_codec,
+)
+
+
+class JSONCodecTestCase(unittest.TestCase):
+    """Test the ``json_codec``."""
+
+    codec = json_codec
+
+    def test_dumps(self):
+        """Ensure bytes are returned and types are encoded the same
+        way as by ``wheezy.core.json``.
+        """
+        obj = {
+            "s": "</script>в",
+            1: [1.5, None, True],
+            "d": Decimal("1.10"),
+            "dt": datetime(2012, 4, 17, 9, 58, 27),
+            "dm": datetime.min,
+            "date": date(2012, 4, 17),
+            "t": time(9, 58),
+        }
+
+        s = self.codec.dumps(obj)
+
+        assert isinstance(s, bytes)
+        assert json_codec.dumps(obj) == s
+        assert b"<\\/script>" in s
+        assert obj["s"].encode("UTF-8") not in s
+
+    def test_loads(self):
+        """Ensure bytes are decoded."""
+        assert {"a": ["в", 1]} == self.codec.loads(
+            '{"a": ["в", 1]}'.encode("UTF-8")
+        )
+
+
+@unittest.skipIf(orjson_codec is None, "orjson is not installed")
+class ORJSONCodecTestCase(JSONCodecTestCase):
+    """Test the ``orjson_codec``."""
+
+    codec = orjson_codec
+
+    def test_fast(self):
+        """Ensure orjson codec is preferred."""
+        assert orjson_codec is fast_json_codec
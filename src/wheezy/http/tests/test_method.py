@@ -2,7 +2,11 @@ import unittest
 from unittest.mock import Mock
 
 from wheezy.http.method import accept_method
-from wheezy.http.response import HTTPResponse
+
+from wheezy.http.response import (  # isort:skip
+    HTTPResponse,
+    HTTP_ERROR_RESPONSES,
+)
 
 
 class AcceptMethodTestCase(unittest.TestCase):
@@ -25,7 +29,7 @@ class AcceptMethodTestCase(unittest.TestCase):
             mock_request.method = method
             handler = accept_method("GET")(mock_handler)
             response = handler(mock_request)
-            assert 405 == response.status_code
+            assert HTTP_ERROR_RESPONSES[405] is response
 
     def test_one_of_strategy(self):
         """Multiple HTTP methods constraint check."""
@@ -44,4 +48,4 @@ class AcceptMethodTestCase(unittest.TestCase):
             mock_request.method = method
             handler = accept_method(("GET", "HEAD"))(mock_handler)
             response = handler(mock_request)
-            assert 405 == response.status_code
+            assert HTTP_ERROR_RESPONSES[405] is response
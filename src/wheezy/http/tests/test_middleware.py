@@ -1,3 +1,6 @@
+import os
+import shutil
+import tempfile
 import unittest
 from datetime import datetime, timezone
 from unittest.mock import Mock
@@ -5,21 +8,35 @@ from unittest.mock import Mock
 from wheezy.http.cache import (
     CacheableResponse,
     NotModifiedResponse,
+    PartialContentResponse,
+    RangeNotSatisfiableResponse,
     SurfaceResponse,
     etag_md5crc32,
+    etag_stat,
 )
+from wheezy.http.cachepolicy import HTTPCachePolicy
 from wheezy.http.cacheprofile import CacheProfile, RequestVary
 from wheezy.http.config import bootstrap_http_defaults
 from wheezy.http.cookie import HTTPCookie
 from wheezy.http.middleware import (
+    ConditionalGetMiddleware,
     EnvironCacheAdapterMiddleware,
+    StaticFileResponse,
     WSGIAdapterMiddleware,
+    conditional_get_middleware_factory,
     environ_cache_adapter_middleware_factory,
     http_cache_middleware_factory,
+    static_files_middleware_factory,
     wsgi_adapter_middleware_factory,
 )
 from wheezy.http.request import HTTPRequest
-from wheezy.http.response import HTTPResponse
+
+from wheezy.http.response import (  # isort:skip
+    HTTPFileResponse,
+    HTTPResponse,
+    HTTPStreamingResponse,
+    HTTP_ERROR_RESPONSES,
+)
 
 UTC = timezone.utc
 
@@ -116,6 +133,20 @@ class HTTPCacheMiddlewareTestCase(unittest.TestCase):
         cookies = [n for n, v in response.inner.headers if n == "Set-Cookie"]
         assert 2 == len(cookies)
 
+    def test_file_response(self):
+        """File or streaming response is not cached."""
+        for response in (
+            HTTPFileResponse(__file__),
+            HTTPStreamingResponse(["x"]),
+        ):
+            response.cache_profile = CacheProfile("server", duration=60)
+            self.mock_following.return_value = response
+
+            assert response is self.middleware(
+                self.mock_request, self.mock_following
+            )
+            assert not self.mock_cache.set.called
+
     def test_cache_response_with_dependency(self):
         """HTTP response:
         1. status codes is 200
@@ -151,8 +182,9 @@ class HTTPCacheMiddlewareTestCase(unittest.TestCase):
             "PATH_INFO": "/abc",
             "HTTP_IF_NONE_MATCH": "5d34ab31",
         }
-        self.response.etag = "5d34ab31"
-        self.mock_cache.get.return_value = self.response
+        cached = CacheableResponse(self.response)
+        cached.etag = "5d34ab31"
+        self.mock_cache.get.return_value = cached
         response = self.middleware(self.mock_request, self.mock_following)
 
         assert not self.mock_following.called
@@ -181,11 +213,10 @@ class HTTPCacheMiddlewareTestCase(unittest.TestCase):
             "PATH_INFO": "/abc",
             "HTTP_IF_MODIFIED_SINCE": "Tue, 17 Apr 2012 09:58:27 GMT",
         }
-        self.response.etag = "ab12e3f9"
-        self.response.last_modified = datetime(
-            2012, 4, 17, 9, 58, 27, tzinfo=UTC
-        )
-        self.mock_cache.get.return_value = self.response
+        cached = CacheableResponse(self.response)
+        cached.etag = "ab12e3f9"
+        cached.last_modified = datetime(2012, 4, 17, 9, 58, 27, tzinfo=UTC)
+        self.mock_cache.get.return_value = cached
         response = self.middleware(self.mock_request, self.mock_following)
 
         assert not self.mock_following.called
@@ -201,11 +232,10 @@ class HTTPCacheMiddlewareTestCase(unittest.TestCase):
             "PATH_INFO": "/abc",
             "HTTP_IF_MODIFIED_SINCE": "Tue, 17 Apr 2012 09:58:27 GMT",
         }
-        self.response.etag = None
-        self.response.last_modified = datetime(
-            2012, 4, 17, 9, 0, 0, tzinfo=UTC
-        )
-        self.mock_cache.get.return_value = self.response
+        cached = CacheableResponse(self.response)
+        cached.etag = None
+        cached.last_modified = datetime(2012, 4, 17, 9, 0, 0, tzinfo=UTC)
+        self.mock_cache.get.return_value = cached
         response = self.middleware(self.mock_request, self.mock_following)
 
         assert not self.mock_following.called
@@ -302,6 +332,191 @@ class HTTPCacheMiddlewareTestCase(unittest.TestCase):
         assert self.mock_following.called
         assert isinstance(response, NotModifiedResponse)
 
+    def test_cache_range(self):
+        """A range of cacheable response is returned."""
+        self.mock_request.environ["HTTP_RANGE"] = "bytes=2-"
+        self.response.status_code = 200
+        self.response.cache_profile = CacheProfile("server", duration=60)
+        self.response.coalesce_size = 0
+        self.response.write_bytes(b"abc")
+        self.response.write_bytes(b"def")
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert isinstance(response, PartialContentResponse)
+        assert [b"c", b"def"] == response.buffer
+        assert self.mock_cache.set.called
+        cacheable = self.mock_cache.set.call_args[0][1]
+        self.mock_cache.get.return_value = cacheable
+        self.mock_request.environ["HTTP_RANGE"] = "bytes=9-"
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert isinstance(response, RangeNotSatisfiableResponse)
+        del self.mock_request.environ["HTTP_RANGE"]
+        response = self.middleware(self.mock_request, self.mock_following)
+        assert cacheable is response
+
+
+class ConditionalGetMiddlewareTestCase(unittest.TestCase):
+    """Test the ``ConditionalGetMiddleware``."""
+
+    def setUp(self):
+        self.middleware = conditional_get_middleware_factory({})
+        self.mock_request = Mock()
+        self.mock_request.method = "GET"
+        self.mock_request.environ = {}
+        self.response = HTTPResponse()
+        self.response.write("test")
+        self.policy = HTTPCachePolicy("private")
+        self.response.cache_policy = self.policy
+        self.mock_following = Mock(return_value=self.response)
+
+    def test_factory(self):
+        """Ensure middleware instance."""
+        assert isinstance(self.middleware, ConditionalGetMiddleware)
+
+    def test_no_cache_policy(self):
+        """Response without cache policy is returned as is."""
+        self.response.cache_policy = None
+        self.mock_request.environ["HTTP_IF_NONE_MATCH"] = "*"
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert response is self.response
+
+    def test_etag_match(self):
+        """Return HTTP 304 if any of weak or strong ETags match."""
+        options = {}
+        bootstrap_http_defaults(options)
+        self.policy.etag('"abc"')
+        self.response.cookies.append(HTTPCookie("x", options=options))
+        for value in ('"abc"', 'W/"abc"', '"x", W/"abc"', "*"):
+            self.mock_request.environ["HTTP_IF_NONE_MATCH"] = value
+            self.response.headers = [("Content-Type", "text/html")]
+
+            response = self.middleware(self.mock_request, self.mock_following)
+
+            assert isinstance(response, NotModifiedResponse)
+            names = [n for n, v in response.headers]
+            assert "ETag" in names
+            assert "Set-Cookie" in names
+            assert "Content-Length" not in names
+
+    def test_streaming_not_modified(self):
+        """The body of streaming response is not produced for HTTP 304."""
+        produced = []
+
+        def generate():
+            produced.append(1)
+            yield "x"
+
+        self.response = HTTPStreamingResponse(generate())
+        self.response.cache_policy = self.policy
+        self.mock_following.return_value = self.response
+        self.policy.etag('"abc"')
+        self.mock_request.environ["HTTP_IF_NONE_MATCH"] = '"abc"'
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert isinstance(response, NotModifiedResponse)
+        assert ("ETag", '"abc"') in response.headers
+        assert not produced
+
+    def test_wsgi_response_not_modified(self):
+        """The body of a response without headers attribute is closed
+        without being read, the headers are taken from its call.
+        """
+        body = Mock()
+        policy = self.policy
+
+        class Response(object):
+            status_code = 200
+            cache_policy = policy
+
+            def __call__(self, start_response):
+                start_response("200 OK", [("ETag", '"abc"')])
+                return body
+
+        self.mock_following.return_value = Response()
+        self.policy.etag('"abc"')
+        self.mock_request.environ["HTTP_IF_NONE_MATCH"] = '"abc"'
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert isinstance(response, NotModifiedResponse)
+        assert [("ETag", '"abc"')] == response.headers
+        body.close.assert_called_once_with()
+
+    def test_headers_not_modified(self):
+        """Response with headers is not called."""
+        policy = self.policy
+        response = Mock(status_code=200, cache_policy=policy)
+        response.headers = [("ETag", '"abc"'), ("Content-Length", "1")]
+        self.mock_following.return_value = response
+        self.policy.etag('"abc"')
+        self.mock_request.environ["HTTP_IF_NONE_MATCH"] = '"abc"'
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert isinstance(response, NotModifiedResponse)
+        assert [("ETag", '"abc"')] == response.headers
+        assert not self.mock_following.return_value.called
+
+    def test_etag_mismatch(self):
+        """If there is no ETag match do not check If-Modified-Since."""
+        self.policy.etag('"abc"')
+        self.policy.last_modified(datetime(2012, 4, 17, 9, 0, tzinfo=UTC))
+        self.mock_request.environ = {
+            "HTTP_IF_NONE_MATCH": '"x", "abc,"',
+            "HTTP_IF_MODIFIED_SINCE": "Tue, 17 Apr 2012 09:58:27 GMT",
+        }
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert response is self.response
+
+    def test_not_modified_since(self):
+        """Return HTTP 304 if not modified since."""
+        self.policy.last_modified(datetime(2012, 4, 17, 9, 0, tzinfo=UTC))
+        self.mock_request.environ = {
+            "HTTP_IF_MODIFIED_SINCE": "Tue, 17 Apr 2012 09:58:27 GMT",
+        }
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert isinstance(response, NotModifiedResponse)
+
+    def test_modified_since(self):
+        """Response is modified since."""
+        self.policy.last_modified(datetime(2012, 4, 17, 10, 0, tzinfo=UTC))
+        self.mock_request.environ = {
+            "HTTP_IF_MODIFIED_SINCE": "Tue, 17 Apr 2012 09:58:27 GMT",
+        }
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert response is self.response
+
+    def test_ignored(self):
+        """Only successful responses to GET and HEAD are checked."""
+        self.policy.etag('"abc"')
+        self.mock_request.environ["HTTP_IF_NONE_MATCH"] = '"abc"'
+        self.mock_request.method = "POST"
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert response is self.response
+        self.mock_request.method = "HEAD"
+        self.response.status_code = 404
+
+        response = self.middleware(self.mock_request, self.mock_following)
+
+        assert response is self.response
+        self.mock_following.return_value = None
+
+        assert self.middleware(self.mock_request, self.mock_following) is None
+
 
 class WSGIAdapterMiddlewareFactoryTestCase(unittest.TestCase):
     """Test the ``wsgi_adapter_middleware_factory``."""
@@ -410,6 +625,39 @@ class EnvironCacheAdapterMiddlewareTestCase(unittest.TestCase):
         assert response.cache_policy
         assert '"43be58cc"' == response.cache_policy.http_etag
 
+    def test_cache_profile_streaming_etag(self):
+        """ETag is not computed for streaming response."""
+        profile = CacheProfile("both", etag_func=etag_md5crc32, duration=10)
+        middleware = EnvironCacheAdapterMiddleware()
+        request = HTTPRequest(
+            {"REQUEST_METHOD": "GET", "wheezy.http.cache_profile": profile},
+            None,
+            None,
+        )
+        response = HTTPStreamingResponse(iter(["a", "b"]))
+        response = middleware(request, lambda r: response)
+        assert response.cache_policy
+        assert response.cache_policy.http_etag is None
+        assert [b"a", b"b"] == list(response(Mock()))
+
+    def test_cache_profile_file_etag(self):
+        """ETag of file response is built from file metadata."""
+        profile = CacheProfile("both", etag_func=etag_md5crc32, duration=10)
+        middleware = EnvironCacheAdapterMiddleware()
+        request = HTTPRequest(
+            {"REQUEST_METHOD": "GET", "wheezy.http.cache_profile": profile},
+            None,
+            None,
+        )
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        os.write(fd, b"test")
+        os.close(fd)
+        try:
+            response = middleware(request, lambda r: HTTPFileResponse(path))
+            assert etag_stat(os.stat(path)) == response.cache_policy.http_etag
+        finally:
+            os.remove(path)
+
     def test_cache_profile_with_policy_override(self):
         """Test cache_profile adapter in case cache policy
         is overriden.
@@ -444,3 +692,250 @@ class EnvironCacheAdapterMiddlewareTestCase(unittest.TestCase):
         response = HTTPResponse()
         response = middleware(request, lambda r: response)
         assert cache_dependency == response.cache_dependency
+
+    def test_error_response(self):
+        """Shared error response is replaced by a response that can
+        be modified.
+        """
+        middleware = EnvironCacheAdapterMiddleware()
+        request = HTTPRequest(
+            {"REQUEST_METHOD": "GET", "wheezy.http.cache_policy": "policy"},
+            None,
+            None,
+        )
+        shared = HTTP_ERROR_RESPONSES[404]
+        response = middleware(request, lambda r: shared)
+        assert isinstance(response, HTTPResponse)
+        assert 404 == response.status_code
+        assert "policy" == response.cache_policy
+        assert shared.cache_policy is None
+
+        request.environ.clear()
+        assert shared is middleware(request, lambda r: shared)
+
+
+class StaticFilesMiddlewareTestCase(unittest.TestCase):
+    """Test the ``StaticFilesMiddleware``."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.write("site.css", b"body {}")
+        self.write("site.css.gz", b"gz")
+        self.write("site.css.br", b"br")
+        self.write("large.js", b"x" * 100)
+        os.mkdir(os.path.join(self.root, "sub"))
+        self.middleware = static_files_middleware_factory(
+            {"static_files": {"/static/": self.root}}
+        )
+        self.middleware.cache_max_length = 10
+        self.mock_request = Mock()
+        self.mock_request.method = "GET"
+        self.mock_request.environ = {"PATH_INFO": "/static/site.css"}
+        self.mock_following = Mock(return_value="following")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, content):
+        with open(os.path.join(self.root, name), "wb") as f:
+            f.write(content)
+
+    def serve(self):
+        response = self.middleware(self.mock_request, self.mock_following)
+        if not isinstance(
+            response,
+            (
+                StaticFileResponse,
+                NotModifiedResponse,
+                PartialContentResponse,
+                RangeNotSatisfiableResponse,
+            ),
+        ):
+            return response, None, None
+        mock_start_response = Mock()
+        result = b"".join(response(mock_start_response))
+        status, headers = mock_start_response.call_args[0]
+        return result, status, dict(headers)
+
+    def test_not_found(self):
+        """Call following middleware if there is no such file."""
+        for path in (
+            "/static/",
+            "/static/x.css",
+            "/static/sub",
+            "/static/../static/site.css",
+            "/static/\x00",
+            "/static/\xff",
+            "/other/site.css",
+        ):
+            self.mock_request.environ["PATH_INFO"] = path
+            assert ("following", None, None) == self.serve()
+        self.mock_request.environ["PATH_INFO"] = "/static/site.css"
+        self.mock_request.method = "POST"
+        assert ("following", None, None) == self.serve()
+        assert self.middleware(self.mock_request, None) is None
+
+    def test_serve(self):
+        """Small files are served from memory."""
+        body, status, headers = self.serve()
+
+        assert b"body {}" == body
+        assert "200 OK" == status
+        assert "text/css" == headers["Content-Type"]
+        assert "7" == headers["Content-Length"]
+        assert "public, max-age=3600" == headers["Cache-Control"]
+        assert headers["ETag"].startswith('W/"')
+        assert "Accept-Encoding" == headers["Vary"]
+        assert "Content-Encoding" not in headers
+        path = os.path.realpath(os.path.join(self.root, "site.css"))
+        assert path in self.middleware.cache
+        assert (body, status, headers) == self.serve()
+
+    def test_cache_size(self):
+        """Least recently used files are evicted."""
+        self.middleware.cache_size = 1
+        self.serve()
+        self.write("a.txt", b"a")
+        self.mock_request.environ["PATH_INFO"] = "/static/a.txt"
+
+        assert b"a" == self.serve()[0]
+        assert 1 == len(self.middleware.cache)
+
+    def test_precompressed(self):
+        """Precompressed siblings are served if accepted."""
+        for accept_encoding, content, encoding in (
+            ("gzip, br", b"br", "br"),
+            ("gzip, br;q=0.5", b"gz", "gzip"),
+            ("deflate", b"body {}", None),
+        ):
+            environ = self.mock_request.environ
+            environ["HTTP_ACCEPT_ENCODING"] = accept_encoding
+
+            body, status, headers = self.serve()
+
+            assert content == body
+            assert encoding == headers.get("Content-Encoding")
+            assert str(len(content)) == headers["Content-Length"]
+
+    def test_compressed(self):
+        """Compressed files are served as is, without Content-Encoding
+        and precompressed siblings.
+        """
+        self.write("a.tar.gz", b"tgz")
+        self.write("a.tar.gz.br", b"br")
+        self.write("i.svgz", b"svgz")
+        self.mock_request.environ["HTTP_ACCEPT_ENCODING"] = "gzip, br"
+        for name, content, content_type in (
+            ("a.tar.gz", b"tgz", "application/gzip"),
+            ("i.svgz", b"svgz", "application/gzip"),
+            ("site.css.br", b"br", "application/x-brotli"),
+        ):
+            self.mock_request.environ["PATH_INFO"] = "/static/" + name
+
+            body, status, headers = self.serve()
+
+            assert content == body
+            assert "200 OK" == status
+            assert content_type == headers["Content-Type"]
+            assert "Content-Encoding" not in headers
+            assert "Vary" not in headers
+
+    def test_not_modified(self):
+        """Returns HTTP 304 if ETag or modification time match."""
+        body, status, headers = self.serve()
+        for environ in (
+            {"HTTP_IF_NONE_MATCH": headers["ETag"]},
+            {"HTTP_IF_MODIFIED_SINCE": headers["Last-Modified"]},
+        ):
+            environ["PATH_INFO"] = "/static/site.css"
+            self.mock_request.environ = environ
+
+            body, status, headers = self.serve()
+
+            assert b"" == body
+            assert "304 Not Modified" == status
+            assert "Content-Length" not in headers
+        self.mock_request.environ["HTTP_IF_NONE_MATCH"] = '"x"'
+        assert "200 OK" == self.serve()[1]
+
+    def test_head(self):
+        """HEAD request has no body."""
+        self.mock_request.method = "HEAD"
+
+        body, status, headers = self.serve()
+
+        assert b"" == body
+        assert "7" == headers["Content-Length"]
+
+    def test_file_wrapper(self):
+        """Large files are served with wsgi.file_wrapper."""
+        self.mock_request.environ["PATH_INFO"] = "/static/large.js"
+
+        body, status, headers = self.serve()
+
+        assert b"x" * 100 == body
+        assert "100" == headers["Content-Length"]
+        mock_file_wrapper = Mock(return_value=[b"wrapped"])
+        self.mock_request.environ["wsgi.file_wrapper"] = mock_file_wrapper
+
+        body, status, headers = self.serve()
+
+        assert b"wrapped" == body
+        f, block_size = mock_file_wrapper.call_args[0]
+        assert b"x" * 100 == f.read()
+        f.close()
+
+    def test_range(self):
+        """Serves a range of small file from memory."""
+        self.mock_request.environ["HTTP_RANGE"] = "bytes=1-3"
+
+        body, status, headers = self.serve()
+
+        assert b"ody" == body
+        assert "206 Partial Content" == status
+        assert "bytes 1-3/7" == headers["Content-Range"]
+        assert "3" == headers["Content-Length"]
+        assert "bytes" == headers["Accept-Ranges"]
+
+    def test_range_large(self):
+        """Serves ranges of large file from disk."""
+        self.write("large.js", b"0123456789" * 10)
+        environ = self.mock_request.environ
+        environ["PATH_INFO"] = "/static/large.js"
+        environ["HTTP_RANGE"] = "bytes=95-"
+
+        body, status, headers = self.serve()
+
+        assert b"56789" == body
+        assert "bytes 95-99/100" == headers["Content-Range"]
+        environ["HTTP_RANGE"] = "bytes=0-1,-2"
+
+        body, status, headers = self.serve()
+
+        assert "206 Partial Content" == status
+        assert str(len(body)) == headers["Content-Length"]
+        assert b"\r\n\r\n01\r\n--" in body
+        assert b"\r\n\r\n89\r\n--" in body
+
+    def test_range_not_satisfiable(self):
+        """Returns HTTP 416 if no range is satisfiable."""
+        self.mock_request.environ["HTTP_RANGE"] = "bytes=7-"
+
+        body, status, headers = self.serve()
+
+        assert b"" == body
+        assert "416 Requested Range Not Satisfiable" == status
+        assert "bytes */7" == headers["Content-Range"]
+
+    def test_range_ignored(self):
+        """Full file is served if If-Range does not match."""
+        environ = self.mock_request.environ
+        environ["HTTP_RANGE"] = "bytes=0-1"
+        environ["HTTP_IF_RANGE"] = '"x"'
+
+        assert "200 OK" == self.serve()[1]
+        environ["HTTP_RANGE"] = "lines=0-1"
+        del environ["HTTP_IF_RANGE"]
+        assert "200 OK" == self.serve()[1]
+        self.mock_request.method = "HEAD"
+        assert "200 OK" == self.serve()[1]
@@ -1,38 +1,228 @@
+import json
+import random
 import unittest
+from unittest.mock import patch
+from urllib.parse import unquote
 
-from wheezy.http.parse import parse_cookie, parse_multipart, parse_qs
+from wheezy.core.json import json_encode
+
+from wheezy.http.parse import (
+    CopyOnWriteDict,
+    LazyQuery,
+    ParseCache,
+    accept_values,
+    cookie_cache,
+    negotiate,
+    parse_accept,
+    parse_cookie,
+    parse_multipart,
+    parse_qs,
+    parse_range,
+    query_cache,
+)
 from wheezy.http.tests import sample
 
+QS_SAMPLES = (
+    ("", {"": [""]}),
+    ("&", {"": ["", ""]}),
+    ("&&", {"": ["", "", ""]}),
+    ("=", {"": [""]}),
+    ("=a", {"": ["a"]}),
+    ("a", {"a": [""]}),
+    ("a=", {"a": [""]}),
+    ("a=", {"a": [""]}),
+    ("&a=b", {"": [""], "a": ["b"]}),
+    ("a=a+b&b=b+c", {"a": ["a b"], "b": ["b c"]}),
+    ("a=1&a=2", {"a": ["1", "2"]}),
+    ("a+=", {"a ": [""]}),
+    ("a%20=", {"a ": [""]}),
+    ("a=a%20b", {"a": ["a b"]}),
+    ("a=1,2,3", {"a": ["1", "2", "3"]}),
+    ("a=1,2,", {"a": ["1", "2", ""]}),
+    ("a=1%20,2%20,3%20", {"a": ["1 ", "2 ", "3 "]}),
+    ("a=1%2C2%2C3", {"a": ["1,2,3"]}),
+    ("a=1%2C2,3", {"a": ["1,2", "3"]}),
+    ("a=1,2&b=3,4", {"a": ["1", "2"], "b": ["3", "4"]}),
+)
+
+
+QS_ALPHABET = [" "] + (
+    "a b = & + , % 2 C c D 0 \xe9 %20 %25 %2B %2C %2c %26 %3D %3d %zz "
+    "%C3 %A9 %E2 %82 %AC %F0%9F"
+).split()
+
+
+def parse_qs_reference(qs):
+    """The original field by field ``parse_qs``, kept to verify the
+    semantics of the optimized one.
+    """
+    params = {}
+    for field in qs.split("&"):
+        r = field.partition("=")
+        k = r[0]
+        v = r[2]
+        if "+" in k:
+            k = k.replace("+", " ")
+        if "%" in k:
+            k = unquote(k)
+        if "+" in v:
+            v = v.replace("+", " ")
+        if k in params:
+            params[k].append("%" in v and unquote(v) or v)
+        else:
+            if "," in v:
+                params[k] = [
+                    ("%" in v and unquote(x) or x) for x in v.split(",")
+                ]
+            else:
+                params[k] = ["%" in v and unquote(v) or v]
+    return params
+
 
 class ParseQSTestCase(unittest.TestCase):
     """Test the ``parse_qs``."""
 
     def test_parse(self):
         """Ensure query string is parsed correctly."""
-        for s, e in (
-            ("", {"": [""]}),
-            ("&", {"": ["", ""]}),
-            ("&&", {"": ["", "", ""]}),
-            ("=", {"": [""]}),
-            ("=a", {"": ["a"]}),
-            ("a", {"a": [""]}),
-            ("a=", {"a": [""]}),
-            ("a=", {"a": [""]}),
-            ("&a=b", {"": [""], "a": ["b"]}),
-            ("a=a+b&b=b+c", {"a": ["a b"], "b": ["b c"]}),
-            ("a=1&a=2", {"a": ["1", "2"]}),
-            ("a+=", {"a ": [""]}),
-            ("a%20=", {"a ": [""]}),
-            ("a=a%20b", {"a": ["a b"]}),
-            ("a=1,2,3", {"a": ["1", "2", "3"]}),
-            ("a=1,2,", {"a": ["1", "2", ""]}),
-            ("a=1%20,2%20,3%20", {"a": ["1 ", "2 ", "3 "]}),
-            ("a=1%2C2%2C3", {"a": ["1,2,3"]}),
-            ("a=1%2C2,3", {"a": ["1,2", "3"]}),
-            ("a=1,2&b=3,4", {"a": ["1", "2"], "b": ["3", "4"]}),
-        ):
+        for s, e in QS_SAMPLES:
             assert e == parse_qs(s)
 
+    def test_reference(self):
+        """Ensure random query strings are parsed the same way as by
+        the reference implementation.
+        """
+        r = random.Random(45)
+        for _ in range(20000):
+            qs = "".join(r.choices(QS_ALPHABET, k=r.randint(0, 16)))
+            assert parse_qs_reference(qs) == parse_qs(qs), qs
+
+
+class LazyQueryTestCase(unittest.TestCase):
+    """Test the ``LazyQuery``."""
+
+    def setUp(self):
+        # parse lazily even short query strings
+        self.patcher = patch("wheezy.http.parse.LAZY_QUERY_MIN_LENGTH", 0)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_lookup(self):
+        """Ensure values of a key are the same as of ``parse_qs``."""
+        for s, e in QS_SAMPLES:
+            for name in list(e) + ["x", "a b", " "]:
+                q = LazyQuery(s)
+
+                assert e.get(name) == q.get(name)
+                assert (name in e) == (name in q)
+                if name in e:
+                    assert e[name] == q[name]
+                else:
+                    self.assertRaises(KeyError, lambda q=q, name=name: q[name])
+                assert q.missing is not None
+
+    def test_materialize(self):
+        """Ensure the whole dict is parsed on iteration."""
+        for s, e in QS_SAMPLES:
+            q = LazyQuery(s)
+
+            assert e == q
+            assert sorted(e) == sorted(q)
+            assert len(e) == len(q)
+            assert e == dict(q.items())
+
+    def test_short(self):
+        """Short query string is parsed at once."""
+        self.patcher.stop()
+        try:
+            q = LazyQuery("a=1&b=2")
+        finally:
+            self.patcher.start()
+
+        assert q.missing is None
+        assert {"a": ["1"], "b": ["2"]} == dict.copy(q)
+
+    def test_dict(self):
+        """Ensure it can be used as a dict before it is filled."""
+        for s, e in QS_SAMPLES:
+            assert isinstance(LazyQuery(s), dict)
+            c = LazyQuery(s).copy()
+            assert type(c) is dict
+            assert e == c
+            assert e == dict(LazyQuery(s))
+            assert e == {**LazyQuery(s)}
+            assert e == {} | LazyQuery(s)
+            assert json.dumps(e) == json.dumps(LazyQuery(s))
+            assert e == json.loads(json_encode(LazyQuery(s)))
+
+    def test_identity(self):
+        """Values returned by lookup are kept."""
+        q = LazyQuery("a=1&b=2")
+        a = q["a"]
+        a.append("3")
+
+        assert {"a": ["1", "3"], "b": ["2"]} == dict(q)
+        assert a is q["a"]
+        assert "b" in q
+        assert q.get("c") is None
+        self.assertRaises(KeyError, lambda: q["c"])
+
+    def test_modify(self):
+        """Ensure the dict can be modified."""
+        q = LazyQuery("a=1&b=2")
+        q["c"] = ["3"]
+        del q["a"]
+
+        assert {"b": ["2"], "c": ["3"]} == q
+        assert "{'b': ['2'], 'c': ['3']}" == repr(q)
+
+
+class ParseCacheTestCase(unittest.TestCase):
+    """Test the ``ParseCache``."""
+
+    def test_query(self):
+        """Ensure results are shared and immutable."""
+        cache = query_cache(maxsize=2)
+
+        q = cache("a=1,2&b=3")
+        assert {"a": ("1", "2"), "b": ("3",)} == q
+        assert (0, 1) == (cache.hits, cache.misses)
+        q2 = cache("a=1,2&b=3")
+        assert (1, 1) == (cache.hits, cache.misses)
+        assert q.data is q2.data
+        q2["c"] = ["4"]
+        del q2["a"]
+        assert {"b": ("3",), "c": ["4"]} == q2
+        assert "c" not in q
+        assert "a" in cache("a=1,2&b=3")
+        for s, e in QS_SAMPLES:
+            assert e == {k: list(v) for k, v in cache(s).items()}
+
+    def test_cookie(self):
+        """Ensure parsed cookies are cached."""
+        cache = cookie_cache()
+
+        assert {"a": "1", "b": "2"} == cache("a=1; b=2")
+        assert "{'a': '1', 'b': '2'}" == repr(cache("a=1; b=2"))
+        assert (1, 1) == (cache.hits, cache.misses)
+
+    def test_lru(self):
+        """Least recently used inputs are evicted."""
+        calls = []
+
+        def parse(value):
+            calls.append(value)
+            return {"v": value}
+
+        cache = ParseCache(parse, maxsize=2, max_length=3)
+        for value in ("a", "b", "a", "c", "a", "b", "long", "long"):
+            assert isinstance(cache(value), CopyOnWriteDict)
+
+        assert ["a", "b", "c", "b", "long", "long"] == calls
+        assert 2 == len(cache)
+        assert (2, 6) == (cache.hits, cache.misses)
+
 
 class ParseMultiPartTestCase(unittest.TestCase):
     """Test the ``parse_multipart``."""
@@ -128,3 +318,97 @@ class ParseCookieTestCase(unittest.TestCase):
     def test_duplicate_keys_last_wins(self):
         """Uses last occurrence when duplicate cookie names are present."""
         assert parse_cookie("a=1; a=2") == {"a": "2"}
+
+
+class ParseAcceptTestCase(unittest.TestCase):
+    """Test the ``parse_accept``."""
+
+    def test_parse(self):
+        """Ensure tokens are ordered by quality."""
+        for s, e in (
+            ("", []),
+            (" , ", []),
+            ("gzip", [("gzip", 1.0)]),
+            ("GZip, br", [("gzip", 1.0), ("br", 1.0)]),
+            ("gzip;q=0.5, br", [("br", 1.0), ("gzip", 0.5)]),
+            ("gzip; q=0.5;x=1", [("gzip", 0.5)]),
+            ("gzip;q=x, br;q=0", [("gzip", 0.0), ("br", 0.0)]),
+            (
+                "text/html;level=1, */*;q=0.1",
+                [("text/html", 1.0), ("*/*", 0.1)],
+            ),
+        ):
+            assert e == parse_accept(s)
+
+
+class NegotiateTestCase(unittest.TestCase):
+    """Test the ``negotiate``."""
+
+    def test_accept_values(self):
+        """Ensure the same header value is parsed once."""
+        value = "gzip;q=0.5, br, x-negotiate-test"
+        assert accept_values(value) is accept_values(value)
+        assert (
+            ("br", 1.0),
+            ("x-negotiate-test", 1.0),
+            ("gzip", 0.5),
+        ) == accept_values(value)
+
+    def test_negotiate(self):
+        """Ensure the most specific range wins, server preference is
+        used for equal q-values.
+        """
+        html = ("text/html", "application/json")
+        langs = ("en-US", "de", "fr-CA")
+        for value, offers, e in (
+            (None, html, "text/html"),
+            (None, (), None),
+            ("", html, None),
+            ("*/*", html, "text/html"),
+            ("application/json, text/html;q=0.5", html, "application/json"),
+            ("text/*;q=0.5, application/json;q=0.1", html, "text/html"),
+            ("text/html;q=0, */*", html, "application/json"),
+            ("image/*", html, None),
+            ("image/png, *", html, "text/html"),
+            ("de-AT, en;q=0.8", langs, "en-US"),
+            ("fr, en-US;q=0.5", langs, "fr-CA"),
+            ("en-GB", langs, None),
+            ("*, en;q=0", langs, "de"),
+            ("EN-us", langs, "en-US"),
+        ):
+            assert e == negotiate(value, offers), value
+
+
+class ParseRangeTestCase(unittest.TestCase):
+    """Test the ``parse_range``."""
+
+    def test_parse(self):
+        """Ensure byte ranges are clipped to the length."""
+        for s, e in (
+            ("bytes=0-0", [(0, 1)]),
+            ("bytes=0-99", [(0, 10)]),
+            ("bytes = 2-3 , 5-", [(2, 4), (5, 10)]),
+            ("bytes=-3", [(7, 10)]),
+            ("bytes=-30", [(0, 10)]),
+            ("bytes=10-, -0", []),
+            ("bytes=10-, 1-1", [(1, 2)]),
+        ):
+            assert e == parse_range(s, 10)
+
+    def test_malformed(self):
+        """Ensure malformed or unsupported ranges are ignored."""
+        for s in (
+            "",
+            "bytes",
+            "bytes=",
+            "bytes=-",
+            "bytes=a-b",
+            "bytes=3-2",
+            "bytes=1-2-3",
+            "bytes=\xb2-",
+            "bytes=0-\xb9",
+            "bytes=\u0661-",
+            "items=0-1",
+            "bytes=" + ",".join(["0-1"] * 17),
+        ):
+            assert parse_range(s, 10) is None
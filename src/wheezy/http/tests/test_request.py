@@ -1,7 +1,12 @@
 import unittest
-from unittest.mock import patch
+from io import BytesIO
+from json import dumps as json_dumps
+from unittest.mock import Mock, patch
+
+from wheezy.core.json import json_encode
 
 from wheezy.http import request
+from wheezy.http.parse import cookie_cache, query_cache
 from wheezy.http.request import HTTPRequest
 from wheezy.http.tests import sample
 
@@ -43,6 +48,19 @@ class HTTPRequestTestCase(unittest.TestCase):
     def test_query(self):
         """Ensure returns a dict of query values."""
         assert {"c": ["1"], "q": ["x"]} == self.request.query
+        assert isinstance(self.request.query, dict)
+        assert {"c": ["1"], "q": ["x"]} == self.request.query.copy()
+        assert '{"q":["x"],"c":["1"]}' == json_encode(self.request.query)
+
+    def test_parse_cache(self):
+        """Ensure query and cookies are parsed by cache if configured."""
+        self.options["HTTP_QUERY_CACHE"] = query_cache()
+        self.options["HTTP_COOKIE_CACHE"] = cookie_cache()
+
+        assert {"q": ("x",), "c": ("1",)} == self.request.query
+        assert {"ID": "1234", "PREF": "abc"} == self.request.cookies
+        assert "x" == self.request.get_param("q")
+        assert 1 == self.options["HTTP_QUERY_CACHE"].misses
 
     def test_get_param(self):
         assert "1" == self.request.get_param("c")
@@ -72,11 +90,36 @@ class HTTPRequestTestCase(unittest.TestCase):
 
         patcher.stop()
 
+    def test_form_json_codec(self):
+        """Ensure request body bytes are passed to JSON codec."""
+        mock_codec = Mock()
+        mock_codec.loads.return_value = {"x": 1}
+        self.options["JSON_CODEC"] = mock_codec
+
+        sample.json(self.environ)
+        assert {"x": 1} == self.request.form
+
+        mock_codec.loads.assert_called_once_with(b"{}")
+
     def test_form_unknown(self):
         """Ensure returns None."""
         sample.unknown(self.environ)
         assert not self.request.form
 
+    def test_form_loaded_once(self):
+        """Ensure request body is loaded once even if there are no
+        files.
+        """
+        sample.urlencoded(self.environ)
+        assert self.request.form
+        assert self.request.files is None
+        assert self.request.form is self.request.form
+
+    def test_slots(self):
+        """Ensure there is no instance dict."""
+        assert not hasattr(self.request, "__dict__")
+        self.assertRaises(AttributeError, lambda: self.request.x)
+
     def test_file(self):
         """Ensure returns a dict of file values."""
         sample.multipart(self.environ)
@@ -103,6 +146,17 @@ class HTTPRequestTestCase(unittest.TestCase):
         del self.environ["HTTP_COOKIE"]
         assert {} == self.request.cookies
 
+    def test_accept(self):
+        """Returns Accept-* headers ordered by quality."""
+        self.environ["HTTP_ACCEPT"] = "text/html;q=0.9, application/json"
+        self.environ["HTTP_ACCEPT_LANGUAGE"] = "en;q=0.5, de"
+        assert (
+            ("application/json", 1.0),
+            ("text/html", 0.9),
+        ) == self.request.accept
+        assert (("de", 1.0), ("en", 0.5)) == self.request.accept_language
+        assert () == self.request.accept_encoding
+
     def test_ajax(self):
         """Returns True if HTTP request is ajax request."""
         assert self.request.ajax
@@ -147,3 +201,158 @@ class HTTPRequestTestCase(unittest.TestCase):
         """Ensure returns input stream."""
         sample.urlencoded(self.environ)
         assert 48 == len(self.request.stream.read())
+
+
+class TerminatedInputTestCase(unittest.TestCase):
+    """Test the ``HTTPRequest`` with terminated input of unknown
+    length (e.g. chunked transfer encoding).
+    """
+
+    def setUp(self):
+        self.options = {"MAX_CONTENT_LENGTH": 1024}
+        self.environ = {"REQUEST_METHOD": "POST"}
+        self.request = HTTPRequest(self.environ, "UTF-8", self.options)
+
+    def terminated(self, setup):
+        setup(self.environ)
+        self.environ["CONTENT_LENGTH"] = ""
+        self.environ["wsgi.input_terminated"] = True
+
+    def test_content_length(self):
+        """Content length is unknown for terminated input and 0 if
+        it is missing otherwise.
+        """
+        self.terminated(sample.urlencoded)
+        assert self.request.content_length is None
+        del self.environ["wsgi.input_terminated"]
+        assert 0 == self.request.content_length
+
+    def test_form_urlencoded(self):
+        """Form is read until EOF."""
+        self.terminated(sample.urlencoded)
+        assert ["en"] == self.request.form["lang"]
+
+    def test_form_json(self):
+        """JSON is read until EOF."""
+        self.terminated(sample.json)
+        assert {} == self.request.form
+
+    def test_form_multipart(self):
+        """Multipart form is read until EOF."""
+        self.terminated(sample.multipart)
+        assert ["test"] == self.request.form["name"]
+        assert b"hello" == self.request.files["file"][0].value
+
+    def test_iter_body(self):
+        """Body blocks are read until EOF."""
+        self.terminated(sample.urlencoded)
+        assert 48 == len(b"".join(self.request.iter_body(5)))
+
+    def test_max_content_length(self):
+        """Bytes actually read are limited."""
+        for setup in (sample.urlencoded, sample.json, sample.multipart):
+            self.terminated(setup)
+            self.options["MAX_CONTENT_LENGTH"] = 1
+            request = HTTPRequest(self.environ, "UTF-8", self.options)
+
+            self.assertRaises(ValueError, lambda request=request: request.form)
+            self.environ["wsgi.input"].seek(0)
+            self.assertRaises(
+                ValueError, lambda request=request: list(request.iter_body())
+            )
+            assert 2 >= self.environ["wsgi.input"].tell()
+
+
+class IterJSONTestCase(unittest.TestCase):
+    """Test the ``HTTPRequest.iter_json``."""
+
+    def setUp(self):
+        self.options = {"MAX_CONTENT_LENGTH": 1024}
+        self.environ = {
+            "REQUEST_METHOD": "POST",
+            "CONTENT_TYPE": "application/json",
+        }
+        self.request = HTTPRequest(self.environ, "UTF-8", self.options)
+
+    def setup_body(self, body):
+        body = body.encode("UTF-8")
+        self.environ["wsgi.input"] = BytesIO(body)
+        self.environ["CONTENT_LENGTH"] = str(len(body))
+
+    def test_iter_body(self):
+        """Body is read by blocks up to content length."""
+        self.setup_body("0123456789")
+        self.environ["CONTENT_LENGTH"] = "9"
+
+        assert [b"0123", b"4567", b"8"] == list(self.request.iter_body(4))
+
+    def test_max_content_length(self):
+        """Body larger than maximum content length is rejected."""
+        self.setup_body("[%s]" % ",".join(["1"] * 1000))
+
+        self.assertRaises(ValueError, lambda: list(self.request.iter_json()))
+
+    def test_items(self):
+        """Items are split across blocks."""
+        items = [
+            {"id": 1, "name": "\\u0432\\u0430"},
+            12345,
+            -1.5e3,
+            "x, ]",
+            [1, [2]],
+            True,
+            None,
+        ]
+        self.setup_body(" [ %s ] " % ", ".join(json_dumps(i) for i in items))
+        for block_size in (1, 2, 3, 7, 1024):
+            self.environ["wsgi.input"].seek(0)
+
+            assert items == list(self.request.iter_json(block_size))
+
+    def test_nested_items(self):
+        """Strings with brackets and escapes in nested items are split
+        across blocks.
+        """
+        self.options["MAX_CONTENT_LENGTH"] = 100000
+        items = [
+            {"a": 'x"]}[{\\', "b": [1, [2, {"c": '\\"'}]]},
+            list(range(2000)),
+            "\\",
+        ]
+        self.setup_body("[%s]" % ",".join(json_dumps(i) for i in items))
+        for block_size in (1, 2, 3, 7, 1024):
+            self.environ["wsgi.input"].seek(0)
+
+            assert items == list(self.request.iter_json(block_size))
+
+    def test_empty(self):
+        """Empty array has no items."""
+        self.setup_body(" [ ] ")
+        assert [] == list(self.request.iter_json(1))
+
+    def test_malformed(self):
+        """Malformed JSON array raises ValueError."""
+        for body in (
+            "",
+            "{}",
+            "[1",
+            "[1,]",
+            "[1 2]",
+            "[x]",
+            "[1,",
+            '["a',
+            "[[1]",
+            '[{"a": "\\"}]',
+            "[1] x",
+            "[] []",
+            "[1]]",
+        ):
+            self.setup_body(body)
+            for block_size in (1, 1024):
+                self.environ["wsgi.input"].seek(0)
+                self.assertRaises(
+                    ValueError,
+                    lambda block_size=block_size: list(
+                        self.request.iter_json(block_size)
+                    ),
+                )
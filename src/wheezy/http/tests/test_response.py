@@ -1,8 +1,24 @@
+import os
+import tempfile
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 from wheezy.http import response
-from wheezy.http.response import json_response
+from wheezy.http.cachepolicy import HTTPCachePolicy
+
+from wheezy.http.response import (  # isort:skip
+    HTTPArenaResponse,
+    HTTPErrorResponse,
+    HTTPFileResponse,
+    HTTPResponse,
+    HTTPStreamingResponse,
+    HTTP_ERROR_RESPONSES,
+    http_error,
+    json_response,
+    method_not_allowed,
+    not_found,
+    redirect,
+)
 
 
 class ShortcutsTestCase(unittest.TestCase):
@@ -22,3 +38,304 @@ class ShortcutsTestCase(unittest.TestCase):
         mock_json_encode.assert_called_once_with({})
 
         assert "200 OK" == res.get_status()
+
+    def test_json_response_codec(self):
+        """json_response with codec"""
+        mock_codec = Mock()
+        mock_codec.dumps.return_value = '{"x":"\u0432"}'.encode("UTF-8")
+
+        res = json_response({}, codec=mock_codec)
+
+        assert [b'{"x":"\xd0\xb2"}'] == res.buffer
+        mock_codec.dumps.assert_called_once_with({})
+
+        res = json_response({}, "cp1251", codec=mock_codec)
+
+        assert "application/json; charset=cp1251" == res.content_type
+        assert [b'{"x":"\xe2"}'] == res.buffer
+
+    def test_redirect(self):
+        """Ensure redirect response has Location header."""
+        r = redirect("/login")
+        assert 302 == r.status_code
+        r.cookies.append("cookie")
+        assert [
+            ("Content-Type", "text/html; charset=UTF-8"),
+            ("Location", "/login"),
+        ] == r.headers
+
+
+class InternedHeadersTestCase(unittest.TestCase):
+    """Test the interned response headers."""
+
+    def test_call(self):
+        """Headers of responses without cache policy and cookies are
+        shared.
+        """
+        headers = []
+        for _ in range(2):
+            r = HTTPResponse("text/csv")
+            r.write_bytes(b"a,b")
+            r(Mock())
+            headers.append(r.headers)
+        assert [
+            ("Content-Type", "text/csv"),
+            ("Cache-Control", "private"),
+            ("Content-Length", "3"),
+        ] == headers[0]
+        assert all(a is b for a, b in zip(*headers))
+
+    def test_bounded(self):
+        """Headers are not interned once the limit is reached."""
+        patcher = patch.object(response, "MAX_INTERNED_HEADERS", 0)
+        patcher.start()
+        try:
+            n = 10**9
+            assert ("Content-Length", str(n)) == (
+                response.content_length_header(n)
+            )
+            assert n not in response.CONTENT_LENGTH_HEADERS
+            response.header_prefix("x/y")
+            assert "x/y" not in response.HEADER_PREFIXES
+        finally:
+            patcher.stop()
+
+
+class HTTPErrorResponseTestCase(unittest.TestCase):
+    """Test the ``HTTPErrorResponse``."""
+
+    def test_shared(self):
+        """A single response is shared per status code, the status
+        shortcuts return a response that can be modified.
+        """
+        r = HTTP_ERROR_RESPONSES[404]
+        assert isinstance(r, HTTPErrorResponse)
+        assert 404 == r.status_code
+        assert 405 == HTTP_ERROR_RESPONSES[405].status_code
+        for shortcut in (not_found, method_not_allowed):
+            r = shortcut()
+            assert isinstance(r, HTTPResponse)
+            assert r is not shortcut()
+            r.write("error")
+        assert not isinstance(http_error(404), HTTPErrorResponse)
+
+    def test_immutable(self):
+        """Raises AttributeError on modification."""
+        r = HTTP_ERROR_RESPONSES[404]
+        self.assertRaises(AttributeError, setattr, r, "status_code", 200)
+        self.assertRaises(AttributeError, setattr, r, "cache_policy", 1)
+        self.assertRaises(AttributeError, lambda: r.headers.append(1))
+
+    def test_call(self):
+        """Headers passed to server can be modified."""
+        r = HTTP_ERROR_RESPONSES[404]
+        mock_start_response = Mock()
+
+        assert () == r(mock_start_response)
+        status, headers = mock_start_response.call_args[0]
+        assert "404 Not Found" == status
+        assert [
+            ("Content-Type", "text/html; charset=UTF-8"),
+            ("Cache-Control", "private"),
+            ("Content-Length", "0"),
+        ] == headers
+        headers.append(("Date", "now"))
+        assert 3 == len(r.headers)
+
+
+class HTTPResponseTestCase(unittest.TestCase):
+    """Test the ``HTTPResponse``."""
+
+    def test_coalesce(self):
+        """Adjacent small chunks are joined into blocks."""
+        r = HTTPResponse()
+        r.coalesce_size = 4
+        for chunk in (b"a", b"b", b"cdefg", b"h", b"ij", b"kl", b"m"):
+            r.write_bytes(chunk)
+        mock_start_response = Mock()
+
+        result = r(mock_start_response)
+
+        assert [b"ab", b"cdefg", b"hijkl", b"m"] == result
+        status, headers = mock_start_response.call_args[0]
+        assert ("Content-Length", "13") in headers
+
+    def test_coalesce_small(self):
+        """Body smaller than block is sent as a single chunk."""
+        r = HTTPResponse()
+        r.write("a")
+        r.write("b")
+        assert [b"ab"] == r(Mock())
+        r = HTTPResponse()
+        r.write("a")
+        assert r.buffer is r(Mock())
+
+    def test_coalesce_disabled(self):
+        """Chunks are sent as is."""
+        r = HTTPResponse()
+        r.coalesce_size = 0
+        r.write("a")
+        r.write("b")
+        assert [b"a", b"b"] == r(Mock())
+
+    def test_lazy_lists(self):
+        """Headers, cookies and cache dependency lists are created on
+        first access.
+        """
+        r = HTTPResponse("text/plain")
+        assert not hasattr(r, "__dict__")
+        assert not r._cookies and not r._cache_dependency
+        r.cache_dependency.append("key")
+        assert ["key"] == r.cache_dependency
+        mock_start_response = Mock()
+
+        assert [] == r(mock_start_response)
+        status, headers = mock_start_response.call_args[0]
+        assert [
+            ("Content-Type", "text/plain"),
+            ("Cache-Control", "private"),
+            ("Content-Length", "0"),
+        ] == headers
+        assert headers is r.headers
+        assert not r._cookies
+
+
+class HTTPArenaResponseTestCase(unittest.TestCase):
+    """Test the ``HTTPArenaResponse``."""
+
+    def test_call(self):
+        """Written chunks are sent as a single block."""
+        r = HTTPArenaResponse()
+        r.write("a")
+        r.write("\u0432")
+        r.write_bytes(b"b")
+        mock_start_response = Mock()
+
+        result = r(mock_start_response)
+
+        assert [b"a\xd0\xb2b"] == result
+        assert bytes is type(result[0])
+        status, headers = mock_start_response.call_args[0]
+        assert ("Content-Length", "4") in headers
+
+    def test_buffer(self):
+        """Arena is moved to buffer on access, buffer can be replaced."""
+        r = HTTPArenaResponse()
+        assert [] == r.buffer
+        r.write("a")
+        assert [b"a"] == r.buffer
+        r.write("b")
+        assert [b"a", b"b"] == r.buffer
+        r.write("c")
+        r.buffer = (b"x",)
+        assert (b"x",) == r.buffer
+
+
+class HTTPStreamingResponseTestCase(unittest.TestCase):
+    """Test the ``HTTPStreamingResponse``."""
+
+    def test_call(self):
+        """Chunks are encoded lazily, Content-Length is omitted."""
+        mock_cookie = Mock()
+        mock_cookie.http_set_cookie.return_value = ("Set-Cookie", "x")
+
+        def generate():
+            yield "a"
+            yield b"b"
+            yield "\u0432"
+
+        r = HTTPStreamingResponse(generate())
+        r.cookies.append(mock_cookie)
+        mock_start_response = Mock()
+
+        result = r(mock_start_response)
+
+        assert not isinstance(result, (list, tuple))
+        assert [b"a", b"b", b"\xd0\xb2"] == list(result)
+        status, headers = mock_start_response.call_args[0]
+        assert "200 OK" == status
+        assert [
+            ("Content-Type", "text/html; charset=UTF-8"),
+            ("Cache-Control", "private"),
+            ("Set-Cookie", "x"),
+        ] == headers
+
+    def test_close(self):
+        """Closing the response closes the iterable."""
+        mock_iterable = Mock()
+        mock_iterable.__iter__ = Mock(return_value=iter([b"a", b"b"]))
+        r = HTTPStreamingResponse(mock_iterable)
+
+        result = r(Mock())
+        assert b"a" == next(result)
+        result.close()
+
+        mock_iterable.close.assert_called_once_with()
+
+
+class HTTPFileResponseTestCase(unittest.TestCase):
+    """Test the ``HTTPFileResponse``."""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".txt")
+        os.write(fd, b"0123456789")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def start(self, response):
+        mock_start_response = Mock()
+        result = response(mock_start_response)
+        status, headers = mock_start_response.call_args[0]
+        return result, status, dict(headers)
+
+    def test_path(self):
+        """Content-Type is guessed and Content-Length is taken from
+        file metadata.
+        """
+        r = HTTPFileResponse(self.path, block_size=4)
+        assert "text/plain" == r.content_type
+        assert () == r.buffer
+
+        result, status, headers = self.start(r)
+
+        assert [b"0123", b"4567", b"89"] == list(result)
+        assert "200 OK" == status
+        assert "10" == headers["Content-Length"]
+        assert "private" == headers["Cache-Control"]
+
+    def test_file(self):
+        """File object is read from the current position."""
+        f = open(self.path, "rb")
+        f.seek(4)
+        r = HTTPFileResponse(f)
+        r.cache_policy = HTTPCachePolicy("public")
+        assert "application/octet-stream" == r.content_type
+
+        result, status, headers = self.start(r)
+
+        assert b"456789" == b"".join(result)
+        assert "6" == headers["Content-Length"]
+        assert "public" == headers["Cache-Control"]
+        assert f.closed
+
+    def test_file_wrapper(self):
+        """File is returned with wsgi.file_wrapper."""
+        mock_file_wrapper = Mock(return_value="wrapped")
+        r = HTTPFileResponse(
+            self.path, "text/csv", file_wrapper=mock_file_wrapper
+        )
+
+        result, status, headers = self.start(r)
+
+        assert "wrapped" == result
+        assert "text/csv" == headers["Content-Type"]
+        f, block_size = mock_file_wrapper.call_args[0]
+        assert 65536 == block_size
+        assert b"0123456789" == f.read()
+        f.close()
+
+    def test_not_found(self):
+        """Missing file is reported early."""
+        self.assertRaises(OSError, HTTPFileResponse, self.path + ".x")
@@ -1,7 +1,30 @@
+import os
+import tempfile
 import unittest
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock
 
-from wheezy.http.transforms import gzip_transform, response_transforms
+from wheezy.http.response import (  # isort:skip
+    HTTPFileResponse,
+    HTTP_ERROR_RESPONSES,
+)
+from wheezy.http.transforms import (
+    AdaptiveLevel,
+    CPULoad,
+    adaptive_gzip_transform,
+    brotli,
+    brotli_transform,
+    compress_transform,
+    gzip_parallel_iterator,
+    gzip_parallel_transform,
+    gzip_stream_transform,
+    gzip_transform,
+    response_transforms,
+    select_encoding,
+    zstd,
+    zstd_transform,
+)
 
 
 class GzipTransformTestCase(unittest.TestCase):
@@ -104,6 +127,305 @@ class GzipTransformTestCase(unittest.TestCase):
         mock_cache_policy.vary.assert_called_once_with("Accept-Encoding")
 
 
+class CompressTransformTestCase(unittest.TestCase):
+    """Test the ``compress_transform`` decorator."""
+
+    def setUp(self):
+        self.mock_request = Mock()
+        self.mock_response = Mock()
+        self.mock_response.buffer = [b"test" * 100]
+        self.mock_response.content_type = "application/json"
+        self.mock_response.cache_policy = None
+
+    def test_encoding_not_accepted(self):
+        """gzip with zero quality is not acceptable."""
+        self.mock_request.environ = {"HTTP_ACCEPT_ENCODING": "gzip;q=0"}
+
+        transform = compress_transform(encodings=("gzip",), min_length=4)
+        response = transform(self.mock_request, self.mock_response)
+
+        assert not response.headers.append.called
+        assert [b"test" * 100] == response.buffer
+
+    def test_gzip(self):
+        """Unavailable encodings are skipped."""
+        self.mock_request.environ = {
+            "HTTP_ACCEPT_ENCODING": "deflate, gzip;q=0.5, x;q=1"
+        }
+
+        transform = compress_transform(encodings=("x", "gzip"), min_length=4)
+        response = transform(self.mock_request, self.mock_response)
+
+        response.headers.append.assert_called_once_with(
+            ("Content-Encoding", "gzip")
+        )
+        body = zlib.decompress(b"".join(response.buffer), 16 + 15)
+        assert b"test" * 100 == body
+
+    def test_no_encodings(self):
+        """Raises AssertionError if none of encodings is available."""
+        self.assertRaises(
+            AssertionError, lambda: compress_transform(encodings=("x",))
+        )
+
+    def test_select_encoding(self):
+        """Server preference is used for equal q-values."""
+        encodings = ("br", "zstd", "gzip")
+        for accept_encoding, e in (
+            ("", None),
+            ("gzip", "gzip"),
+            ("gzip, deflate, br, zstd", "br"),
+            ("gzip, br;q=0.9", "gzip"),
+            ("br;q=0, *", "zstd"),
+            ("*;q=0", None),
+        ):
+            assert e == select_encoding(accept_encoding, encodings)
+
+    @unittest.skipIf(brotli is None, "brotli is not installed")
+    def test_brotli(self):  # pragma: nocover
+        """br"""
+        self.mock_request.environ = {"HTTP_ACCEPT_ENCODING": "gzip, br"}
+
+        transform = brotli_transform(min_length=4)
+        response = transform(self.mock_request, self.mock_response)
+
+        response.headers.append.assert_called_once_with(
+            ("Content-Encoding", "br")
+        )
+        assert b"test" * 100 == brotli.decompress(response.buffer[0])
+
+    @unittest.skipIf(zstd is None, "zstd is not available")
+    def test_zstd(self):  # pragma: nocover
+        """zstd"""
+        self.mock_request.environ = {"HTTP_ACCEPT_ENCODING": "zstd"}
+
+        transform = zstd_transform(min_length=4)
+        response = transform(self.mock_request, self.mock_response)
+
+        response.headers.append.assert_called_once_with(
+            ("Content-Encoding", "zstd")
+        )
+        assert b"test" * 100 == zstd.decompress(response.buffer[0])
+
+
+class GzipParallelTransformTestCase(unittest.TestCase):
+    """Test the ``gzip_parallel_transform`` decorator."""
+
+    def setUp(self):
+        self.mock_request = Mock()
+        self.mock_request.environ = {"HTTP_ACCEPT_ENCODING": "gzip"}
+        self.mock_response = Mock()
+        self.mock_response.content_type = "application/json"
+        self.mock_response.cache_policy = None
+
+    def test_iterator(self):
+        """Blocks are concatenated into a valid gzip stream."""
+        executor = ThreadPoolExecutor(2)
+        for size in (0, 1, 15, 16, 17, 64, 100, 40000):
+            data = os.urandom(size // 2).hex().encode("ascii")
+            for e in (None, executor):
+                result = gzip_parallel_iterator(
+                    [data[:7], data[7:]], block_size=16, executor=e
+                )
+                assert data == zlib.decompress(b"".join(result), 31)
+        executor.shutdown()
+
+    def test_compress(self):
+        """Large body is compressed in parallel."""
+        data = b"".join([b'{"id": %d}, ' % i for i in range(20000)])
+        self.mock_response.buffer = [data]
+
+        transform = gzip_parallel_transform(
+            parallel_length=1024, block_size=4096, max_workers=2
+        )
+        response = transform(self.mock_request, self.mock_response)
+
+        response.headers.append.assert_called_once_with(
+            ("Content-Encoding", "gzip")
+        )
+        assert 2 + (len(data) + 4095) // 4096 == len(response.buffer)
+        assert data == zlib.decompress(b"".join(response.buffer), 31)
+
+    def test_compress_serial(self):
+        """Body shorter than parallel length is compressed at once."""
+        self.mock_response.buffer = [b"test" * 1000]
+
+        transform = gzip_parallel_transform(block_size=16)
+        response = transform(self.mock_request, self.mock_response)
+
+        assert 3 == len(response.buffer)
+        assert b"test" * 1000 == zlib.decompress(b"".join(response.buffer), 31)
+
+
+class AdaptiveGzipTransformTestCase(unittest.TestCase):
+    """Test the ``adaptive_gzip_transform`` decorator."""
+
+    def setUp(self):
+        self.load = 0.0
+        self.level = AdaptiveLevel(large_length=100, load=lambda: self.load)
+
+    def test_level(self):
+        """Level is chosen by content type, size and load."""
+        for content_type, size, load, e in (
+            ("text/html", 10, 0.0, 6),
+            ("text/html", 100, 0.0, 4),
+            ("text/html", 10, 0.9, 1),
+            ("application/json", 10, 0.0, 4),
+            ("application/json", 100, 0.5, 2),
+            ("application/json", 100, 0.8, 1),
+        ):
+            self.load = load
+            assert e == self.level(size, content_type)
+        assert {1: 2, 2: 1, 4: 2, 6: 1} == self.level.counters
+
+    def test_level_no_match(self):
+        """Default levels are used if no content type matches."""
+        level = AdaptiveLevel(
+            levels=(("json", (3, 2, 1)), ("xml", (9, 9, 9))),
+            large_length=100,
+            load=lambda: 0.0,
+        )
+        assert 6 == level(10, "text/html")
+        assert 4 == level(100, "text/html")
+
+    def test_compress(self):
+        """Response is compressed with chosen level."""
+        mock_request = Mock()
+        mock_request.environ = {"HTTP_ACCEPT_ENCODING": "gzip"}
+        mock_response = Mock()
+        mock_response.buffer = [b"test" * 100]
+        mock_response.content_type = "text/html"
+        mock_response.cache_policy = None
+
+        transform = adaptive_gzip_transform(min_length=4, level=self.level)
+        response = transform(mock_request, mock_response)
+
+        response.headers.append.assert_called_once_with(
+            ("Content-Encoding", "gzip")
+        )
+        assert b"test" * 100 == zlib.decompress(b"".join(response.buffer), 31)
+        assert {4: 1} == self.level.counters
+
+    def test_default_level(self):
+        """Default level is adaptive."""
+        mock_request = Mock()
+        mock_request.environ = {}
+        mock_response = Mock()
+        mock_response.buffer = [b"test"]
+
+        transform = adaptive_gzip_transform(min_length=4)
+
+        assert mock_response == transform(mock_request, mock_response)
+
+    def test_cpu_load(self):
+        """CPU load is sampled once per interval."""
+        load = CPULoad(interval=0)
+        while load() == 0.0:
+            sum(range(1000))
+        assert load() >= 0.0
+        load.interval = 100
+        value = load.value
+        sum(range(1000))
+        assert value == load()
+
+
+class GzipStreamTransformTestCase(unittest.TestCase):
+    """Test the ``gzip_stream_transform`` decorator."""
+
+    def setUp(self):
+        self.mock_request = Mock()
+        self.mock_request.environ = {"HTTP_ACCEPT_ENCODING": "gzip"}
+        self.mock_response = Mock()
+        self.mock_response.content_type = "text/event-stream"
+        self.mock_response.cache_policy = None
+        self.mock_response.headers = []
+
+    def test_not_accepting(self):
+        """Response is not changed."""
+        self.mock_request.environ = {"HTTP_ACCEPT_ENCODING": "gzip;q=0"}
+        self.mock_response.buffer = buffer = iter([b"a"])
+
+        transform = gzip_stream_transform()
+        response = transform(self.mock_request, self.mock_response)
+
+        assert buffer is response.buffer
+        assert [] == response.headers
+
+    def test_lazy(self):
+        """Each produced chunk is compressed and flushed."""
+        produced = []
+
+        def generate():
+            for chunk in (b"data: 1\n\n", b"data: 2\n\n"):
+                produced.append(chunk)
+                yield chunk
+
+        self.mock_response.buffer = generate()
+
+        transform = gzip_stream_transform()
+        response = transform(self.mock_request, self.mock_response)
+
+        assert [("Content-Encoding", "gzip")] == response.headers
+        assert not produced
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = iter(response.buffer)
+        assert b"" == d.decompress(next(chunks))
+        assert b"data: 1\n\n" == d.decompress(next(chunks))
+        assert 1 == len(produced)
+        assert b"data: 2\n\n" == d.decompress(next(chunks))
+        assert b"" == d.decompress(b"".join(chunks))
+        assert d.eof
+
+    def test_list(self):
+        """List buffer is compressed at once."""
+        self.mock_response.buffer = [b"test"]
+
+        transform = gzip_stream_transform()
+        response = transform(self.mock_request, self.mock_response)
+
+        assert isinstance(response.buffer, tuple)
+        assert b"test" == zlib.decompress(b"".join(response.buffer), 31)
+
+    def test_skip(self):
+        """File response, empty buffer or already encoded response is
+        not changed.
+        """
+        transform = gzip_stream_transform()
+        self.mock_response.buffer = ()
+        assert () == transform(self.mock_request, self.mock_response).buffer
+        self.mock_response.buffer = buffer = [b"test"]
+        self.mock_response.headers = [("Content-Encoding", "br")]
+        response = transform(self.mock_request, self.mock_response)
+        assert buffer is response.buffer
+        assert [("Content-Encoding", "br")] == response.headers
+
+    def test_file_response(self):
+        """File content is sent as is."""
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        os.write(fd, b"test" * 100)
+        os.close(fd)
+        try:
+            response = HTTPFileResponse(path)
+            transform = gzip_stream_transform()
+            response = transform(self.mock_request, response)
+            mock_start_response = Mock()
+            body = b"".join(response(mock_start_response))
+        finally:
+            os.remove(path)
+
+        assert b"test" * 100 == body
+        status, headers = mock_start_response.call_args[0]
+        assert "Content-Encoding" not in dict(headers)
+        assert ("Content-Length", "400") in headers
+
+    def test_error_response(self):
+        """Shared error response is returned unchanged."""
+        response = HTTP_ERROR_RESPONSES[404]
+        transform = gzip_stream_transform()
+
+        assert response is transform(self.mock_request, response)
+
+
 class ResponseTransformsTestCase(unittest.TestCase):
     """Test the ``response_transforms`` decorator."""
 
@@ -1,4 +1,218 @@
-from wheezy.core.collections import gzip_iterator
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, process_time
+
+from wheezy.core.collections import GZIP_HEADER, MAX_INT, gzip_iterator
+
+from wheezy.http.parse import negotiate
+from wheezy.http.response import HTTPErrorResponse, HTTPFileResponse
+
+try:
+    import brotli
+except ImportError:  # pragma: nocover
+    brotli = None
+
+try:
+    from compression import zstd
+except ImportError:  # pragma: nocover
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+
+def gzip_encoder(compress_level):
+    def encode(chunks):
+        return tuple(gzip_iterator(chunks, compress_level))
+
+    return encode
+
+
+def gzip_parallel_iterator(
+    items, compress_level=6, block_size=131072, executor=None
+):
+    """Splits ``items`` into blocks of ``block_size`` and compresses
+    them concurrently on ``executor`` threads (zlib releases GIL).
+    Each block compressor is primed with the last 32K of the preceding
+    data as dictionary and flushed to byte boundary, so compressed
+    blocks are concatenated into a single valid gzip stream (pigz-style).
+
+    >>> import zlib
+    >>> items = [b'Hello World' * 10]
+    >>> result = list(gzip_parallel_iterator(items, block_size=16))
+    >>> zlib.decompress(b''.join(result), 31) == items[0]
+    True
+    """
+    data = b"".join(items)
+    size = len(data)
+    view = memoryview(data)
+    last = max(size - 1, 0) // block_size * block_size
+
+    def compress(offset):
+        start = max(offset - 32768, 0)
+        end = offset + block_size
+        gzip = zlib.compressobj(
+            compress_level,
+            zlib.DEFLATED,
+            -zlib.MAX_WBITS,
+            zlib.DEF_MEM_LEVEL,
+            0,
+            view[start:offset],
+        )
+        chunk = gzip.compress(view[offset:end])
+        if offset == last:
+            return chunk + gzip.flush()
+        return chunk + gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    if executor is None:
+        blocks = map(compress, range(0, last + 1, block_size))
+        crc = zlib.crc32(data)
+    else:
+        crc = executor.submit(zlib.crc32, data)
+        blocks = executor.map(compress, range(0, last + 1, block_size))
+    yield GZIP_HEADER
+    yield from blocks
+    if executor is not None:
+        crc = crc.result()
+    yield struct.pack("<2L", crc & MAX_INT, size & MAX_INT)
+
+
+def gzip_parallel_encoder(
+    compress_level, parallel_length, block_size, executor
+):
+    def encode(chunks):
+        if sum(len(chunk) for chunk in chunks) < parallel_length:
+            return tuple(gzip_iterator(chunks, compress_level))
+        return tuple(
+            gzip_parallel_iterator(
+                chunks, compress_level, block_size, executor
+            )
+        )
+
+    return encode
+
+
+def brotli_encoder(quality):
+    def encode(chunks):
+        return (brotli.compress(b"".join(chunks), quality=quality),)
+
+    return encode
+
+
+def zstd_encoder(level):
+    def encode(chunks):
+        return (zstd.compress(b"".join(chunks), level=level),)
+
+    return encode
+
+
+ENCODERS = {"gzip": gzip_encoder}
+if brotli is not None:  # pragma: nocover
+    ENCODERS["br"] = brotli_encoder
+if zstd is not None:  # pragma: nocover
+    ENCODERS["zstd"] = zstd_encoder
+DEFAULT_LEVELS = {"gzip": 6, "br": 5, "zstd": 3}
+
+
+def gzip_stream_iterator(items, compress_level=6):
+    """Iterates over ``items`` lazily and returns generator of gzipped
+    items. Unlike ``gzip_iterator`` the compressor is flushed after
+    each item, so every chunk can be decompressed by client as soon as
+    it is received.
+
+    >>> import zlib
+    >>> result = list(gzip_stream_iterator([b'Hello', b'', b' World']))
+    >>> assert 4 == len(result)
+    >>> zlib.decompress(b''.join(result), 31)
+    b'Hello World'
+    """
+    size = 0
+    crc = 0
+    gzip = zlib.compressobj(
+        compress_level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, 0
+    )
+    yield GZIP_HEADER
+    for item in items:
+        if not item:
+            continue
+        size += len(item)
+        crc = zlib.crc32(item, crc) & MAX_INT
+        yield gzip.compress(item) + gzip.flush(zlib.Z_SYNC_FLUSH)
+    yield gzip.flush() + struct.pack("<2L", crc, size & MAX_INT)
+
+
+def select_encoding(accept_encoding, encodings):
+    """Selects the best of ``encodings`` (in server preference
+    order) accepted by client according to Accept-Encoding
+    HTTP request header q-values. Returns ``None`` if none is
+    acceptable.
+
+    >>> select_encoding("gzip, br", ("zstd", "br", "gzip"))
+    'br'
+    >>> select_encoding("gzip;q=1, br;q=0.8", ("br", "gzip"))
+    'gzip'
+    >>> select_encoding("*;q=0.5, gzip;q=0", ("gzip", "br"))
+    'br'
+    >>> select_encoding("identity", ("gzip",))
+    """
+    return negotiate(accept_encoding, tuple(encodings))
+
+
+def compressible(content_type):
+    return (
+        "text" in content_type
+        or "json" in content_type
+        or "script" in content_type
+    )
+
+
+def has_content_encoding(headers):
+    for h in headers:
+        if h[0] == "Content-Encoding":
+            return True
+    return False
+
+
+def vary_accept_encoding(response):
+    cache_policy = response.cache_policy
+    if cache_policy:
+        if cache_policy.is_public:
+            cache_policy.vary("Accept-Encoding")
+
+
+def make_compress_transform(encoders, min_length, vary):
+    """Build a transform that compresses response with one of
+    ``encoders`` (a list of pairs: content encoding name and a
+    function to encode chunks) negotiated with client.
+    """
+    encodings = tuple(name for name, encode in encoders)
+    encoders = dict(encoders)
+
+    def compress(request, response):
+        chunks = response.buffer
+        # streamed buffer is left to gzip_stream_transform
+        if (
+            not chunks
+            or not isinstance(chunks, (list, tuple))
+            or len(chunks[0]) < min_length
+        ):
+            return response
+        environ = request.environ
+        if "HTTP_ACCEPT_ENCODING" in environ and compressible(
+            response.content_type
+        ):
+            encoding = select_encoding(
+                environ["HTTP_ACCEPT_ENCODING"], encodings
+            )
+            if encoding:
+                response.headers.append(("Content-Encoding", encoding))
+                response.buffer = encoders[encoding](chunks)
+                if vary:
+                    vary_accept_encoding(response)
+        return response
+
+    return compress
 
 
 def gzip_transform(compress_level=6, min_length=1024, vary=False):
@@ -13,34 +227,264 @@ def gzip_transform(compress_level=6, min_length=1024, vary=False):
 
     ``vary`` - enables response header "Vary: Accept-Encoding".
     """
+    return make_compress_transform(
+        [("gzip", gzip_encoder(compress_level))], min_length, vary
+    )
+
+
+def gzip_parallel_transform(
+    compress_level=6,
+    min_length=1024,
+    vary=False,
+    parallel_length=1048576,
+    block_size=131072,
+    max_workers=None,
+):
+    """Allows gzip compression, large responses are split into blocks
+    compressed concurrently on a thread pool.
+
+    ``parallel_length`` - the minimum length, in bytes, of response
+    body that is compressed in parallel, shorter ones are compressed
+    as in ``gzip_transform``.
+
+    ``block_size`` - the size, in bytes, of a block compressed by
+    a single thread.
+
+    ``max_workers`` - the number of threads, defaults to
+    ``ThreadPoolExecutor`` default.
+
+    See ``gzip_transform`` for ``compress_level``, ``min_length`` and
+    ``vary``.
+    """
+    assert block_size > 0
+    executor = ThreadPoolExecutor(
+        max_workers, thread_name_prefix="gzip_parallel_transform"
+    )
+    return make_compress_transform(
+        [
+            (
+                "gzip",
+                gzip_parallel_encoder(
+                    compress_level, parallel_length, block_size, executor
+                ),
+            )
+        ],
+        min_length,
+        vary,
+    )
+
+
+class CPULoad(object):
+    """A cheap measure of recent worker load: a ratio of process CPU
+    time to wall time elapsed, sampled at most once per ``interval``
+    seconds. It is close to 1.0 for a CPU-bound single threaded worker.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.wall = perf_counter()
+        self.cpu = process_time()
+        self.value = 0.0
+
+    def __call__(self):
+        wall = perf_counter()
+        elapsed = wall - self.wall
+        if elapsed >= self.interval:
+            cpu = process_time()
+            self.value = (cpu - self.cpu) / elapsed
+            self.wall = wall
+            self.cpu = cpu
+        return self.value
+
+
+DEFAULT_ADAPTIVE_LEVELS = (6, 4, 1)
+
+
+class AdaptiveLevel(object):
+    """Chooses compression level by response body size, content type
+    and worker load.
+
+    ``levels`` - a list of pairs: a content type substring and a tuple
+    of levels (idle, large, busy); the first match is used, the
+    default levels (6, 4, 1) are used if none matches. JSON
+    compresses well at low levels, so it is cheaper by default.
+
+    ``large_length`` - the body length, in bytes, from which the large
+    level is used.
+
+    ``high_load`` - the ``load`` value from which the busy level is used.
+
+    ``load`` - a callable that returns recent worker load, defaults to
+    ``CPULoad``. It can be any cheap measure, e.g. request queue depth.
+
+    ``counters`` - a dict that counts responses per chosen level.
+    """
+
+    def __init__(
+        self,
+        levels=(("json", (4, 2, 1)), ("", DEFAULT_ADAPTIVE_LEVELS)),
+        large_length=1048576,
+        high_load=0.8,
+        load=None,
+    ):
+        self.levels = levels
+        self.large_length = large_length
+        self.high_load = high_load
+        self.load = load or CPULoad()
+        self.counters = {}
+
+    def __call__(self, size, content_type):
+        """Returns compression level for the response."""
+        levels = self.select_levels(content_type)
+        if self.load() >= self.high_load:
+            level = levels[2]
+        elif size >= self.large_length:
+            level = levels[1]
+        else:
+            level = levels[0]
+        counters = self.counters
+        counters[level] = counters.get(level, 0) + 1
+        return level
+
+    def select_levels(self, content_type):
+        """Returns levels of the first pattern that matches
+        ``content_type``.
+        """
+        for pattern, levels in self.levels:
+            if pattern in content_type:
+                return levels
+        return DEFAULT_ADAPTIVE_LEVELS
+
+
+def adaptive_gzip_transform(min_length=1024, vary=False, level=None):
+    """Allows gzip compression with level chosen per response by
+    ``level``, defaults to ``AdaptiveLevel``.
+
+    See ``gzip_transform`` for ``min_length`` and ``vary``.
+    """
+    if level is None:
+        level = AdaptiveLevel()
 
     def gzip(request, response):
         chunks = response.buffer
-        if not chunks or len(chunks[0]) < min_length:
+        # streamed buffer is left to gzip_stream_transform
+        if (
+            not chunks
+            or not isinstance(chunks, (list, tuple))
+            or len(chunks[0]) < min_length
+        ):
             return response
         environ = request.environ
+        content_type = response.content_type
         if (
             "HTTP_ACCEPT_ENCODING" in environ
-            and "gzip" in environ["HTTP_ACCEPT_ENCODING"]
+            and compressible(content_type)
+            and select_encoding(environ["HTTP_ACCEPT_ENCODING"], ("gzip",))
         ):
-            content_type = response.content_type
-            if (
-                "text" in content_type
-                or "json" in content_type
-                or "script" in content_type
-            ):
-                response.headers.append(("Content-Encoding", "gzip"))
-                response.buffer = tuple(gzip_iterator(chunks, compress_level))
-                if vary:
-                    cache_policy = response.cache_policy
-                    if cache_policy:
-                        if cache_policy.is_public:
-                            cache_policy.vary("Accept-Encoding")
+            compress_level = level(
+                sum(len(chunk) for chunk in chunks), content_type
+            )
+            response.headers.append(("Content-Encoding", "gzip"))
+            response.buffer = tuple(gzip_iterator(chunks, compress_level))
+            if vary:
+                vary_accept_encoding(response)
+        return response
+
+    return gzip
+
+
+def gzip_stream_transform(compress_level=6, vary=False):
+    """Allows gzip compression of streamed response. The response
+    ``buffer`` can be any iterable (e.g. a generator) of bytes, it is
+    wrapped lazily and compressed chunks are flushed as they are
+    produced, so the body is never buffered as a whole. List or tuple
+    buffer is compressed at once, since its length is needed for
+    Content-Length.
+
+    See ``gzip_transform`` for ``compress_level`` and ``vary``.
+    """
+
+    def gzip(request, response):
+        # shared error and file responses are sent as is, the former is
+        # immutable and the latter buffer is always empty
+        if (
+            not response.buffer
+            or isinstance(response, (HTTPErrorResponse, HTTPFileResponse))
+            or has_content_encoding(response.headers)
+        ):
+            return response
+        environ = request.environ
+        if (
+            "HTTP_ACCEPT_ENCODING" in environ
+            and compressible(response.content_type)
+            and select_encoding(environ["HTTP_ACCEPT_ENCODING"], ("gzip",))
+        ):
+            chunks = gzip_stream_iterator(response.buffer, compress_level)
+            if isinstance(response.buffer, (list, tuple)):
+                chunks = tuple(chunks)
+            response.headers.append(("Content-Encoding", "gzip"))
+            response.buffer = chunks
+            if vary:
+                vary_accept_encoding(response)
         return response
 
     return gzip
 
 
+def brotli_transform(quality=5, min_length=1024, vary=False):
+    """Allows brotli compression, requires ``brotli`` package.
+
+    ``quality`` - the compression level, between 0 and 11.
+
+    See ``gzip_transform`` for ``min_length`` and ``vary``.
+    """
+    if brotli is None:  # pragma: nocover
+        raise ImportError("brotli compression requires brotli package")
+    return make_compress_transform(
+        [("br", brotli_encoder(quality))], min_length, vary
+    )
+
+
+def zstd_transform(level=3, min_length=1024, vary=False):
+    """Allows zstd compression, requires python 3.14 or ``zstandard``
+    package.
+
+    ``level`` - the compression level, between 1 and 22.
+
+    See ``gzip_transform`` for ``min_length`` and ``vary``.
+    """
+    if zstd is None:  # pragma: nocover
+        raise ImportError("zstd compression requires zstandard package")
+    return make_compress_transform(
+        [("zstd", zstd_encoder(level))], min_length, vary
+    )
+
+
+def compress_transform(
+    encodings=("br", "zstd", "gzip"), levels=None, min_length=1024, vary=False
+):
+    """Allows compression with the best content encoding acceptable
+    by client (Accept-Encoding q-values are respected).
+
+    ``encodings`` - content encodings in server preference order,
+    those not available (optional packages are not installed) are
+    skipped.
+
+    ``levels`` - a dict of compression levels per content encoding,
+    defaults to gzip: 6, br: 5, zstd: 3.
+
+    See ``gzip_transform`` for ``min_length`` and ``vary``.
+    """
+    levels = dict(DEFAULT_LEVELS, **(levels or {}))
+    encoders = [
+        (name, ENCODERS[name](levels[name]))
+        for name in encodings
+        if name in ENCODERS
+    ]
+    assert encoders
+    return make_compress_transform(encoders, min_length, vary)
+
+
 def response_transforms(*transforms):
     """Applies several `transforms` at once."""
     assert transforms